@@ -1,12 +1,19 @@
+import time
+_IMPORT_START = time.perf_counter()
 import streamlit as st
 import torch
-import torch.nn as nn
-from torchvision import transforms
-from PIL import Image
 import os
 
 # Import your custom architecture
-from model import BrainTumorModel
+from model import load_inference_model
+from backends import BACKENDS, load_backend
+from microbatch import MicroBatcher
+from prediction_cache import PredictionCache, file_digest
+from preprocess import CLASS_NAMES, IMG_SIZE, load_uint8, normalize_batch
+from profiling import StageProfiler
+from tta import RULES, TTABackend
+# Only meaningful on the first script run; Streamlit reruns find the modules cached
+IMPORT_S = time.perf_counter() - _IMPORT_START
 
 # --- 1. DYNAMIC PATH SETUP ---
 # This ensures the app finds the weights regardless of where you run it from
@@ -14,37 +21,116 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Logic to find the .pth file correctly
 if os.path.basename(BASE_DIR) == "models":
-    MODEL_PATH = os.path.join(BASE_DIR, "brain_tumor_attention_v1.pth")
+    MODEL_DIR = BASE_DIR
 else:
-    MODEL_PATH = os.path.join(BASE_DIR, "models", "brain_tumor_attention_v1.pth")
+    MODEL_DIR = os.path.join(BASE_DIR, "models")
+MODEL_PATH = os.path.join(MODEL_DIR, "brain_tumor_attention_v1.pth")
+# Distilled MobileNetV3-Small student (distill.py): same head, far cheaper on CPU
+STUDENT_PATH = os.path.join(MODEL_DIR, "brain_tumor_student_v1.pth")
+MODELS = {
+    "EfficientNet-B0 (teacher)": MODEL_PATH,
+    "MobileNetV3-Small (student)": STUDENT_PATH,
+}
+# BT_MODEL=student makes the student the default on edge boxes
+DEFAULT_MODEL = list(MODELS)[1] if os.environ.get("BT_MODEL") == "student" else list(MODELS)[0]
 
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+# Default inference backend; CPU serving nodes can set BT_BACKEND=onnx or torchscript
+DEFAULT_BACKEND = os.environ.get("BT_BACKEND", "eager")
+# Micro-batching: concurrent uploads arriving within MAX_WAIT_MS share one forward pass
+MAX_BATCH_SIZE = int(os.environ.get("BT_MAX_BATCH", "16"))
+MAX_WAIT_MS = float(os.environ.get("BT_MAX_WAIT_MS", "10"))
+# Prediction cache: set BT_CACHE_DIR to keep results across restarts as well
+CACHE_DIR = os.environ.get("BT_CACHE_DIR")
+CACHE_DISK_MB = float(os.environ.get("BT_CACHE_DISK_MB", "64"))
+# Profiling: BT_PROFILE=1 prints a stage breakdown per request to the server log
+# and writes a Chrome trace covering the first BT_PROFILE_STEPS requests
+PROFILE = os.environ.get("BT_PROFILE") == "1"
+PROFILE_STEPS = int(os.environ.get("BT_PROFILE_STEPS", "5"))
+# Test-time augmentation (optional): "borderline" re-scores only low-confidence scans.
+# Off unless BT_TTA is set; check eval_test.py --tta recall before enabling it.
+TTA_MODES = ["off", "borderline", "always"]
+DEFAULT_TTA = os.environ.get("BT_TTA", "off")
+TTA_THRESHOLD = float(os.environ.get("BT_TTA_THRESHOLD", "0.90"))
+TRACE_DIR = os.path.join(BASE_DIR, "traces")
 
 # --- 2. LOAD MODEL ---
 @st.cache_resource
-def load_trained_model():
-    # Initialize the EfficientNet + Attention model
-    model = BrainTumorModel(num_classes=4)
-    
-    if not os.path.exists(MODEL_PATH):
-        st.error(f"❌ WEIGHTS NOT FOUND! Looking at: {MODEL_PATH}")
+def get_startup_timings():
+    # Cold-start breakdown (seconds), filled in as the model and backends load
+    return {"imports": IMPORT_S}
+
+def weights_version(weights_path):
+    # (size, mtime) of the .pth. Part of every model/cache key below, so replacing
+    # the weights reloads the model and moves the prediction cache in one rerun.
+    try:
+        stat = os.stat(weights_path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+@st.cache_resource
+def get_weights_hash(weights_path, version):
+    # Hashed once per weights version, before the model is loaded from that file
+    return file_digest(weights_path)[:16] if version else "no-weights"
+
+@st.cache_resource
+def load_trained_model(weights_path=MODEL_PATH, version=None):
+    if not os.path.exists(weights_path):
+        st.error(f"❌ WEIGHTS NOT FOUND! Looking at: {weights_path}")
         st.stop()
     
-    # Load the 99.49% accuracy weights
-    checkpoint = torch.load(MODEL_PATH, map_location=DEVICE)
-    model.load_state_dict(checkpoint)
-    model.to(DEVICE)
-    model.eval()
-    return model
+    # Load the 99.49% accuracy weights: no ImageNet download, mmap'd checkpoint
+    return load_inference_model(weights_path, DEVICE, timings=get_startup_timings())
+
+@st.cache_resource
+def load_inference_backend(name, weights_path=MODEL_PATH, version=None):
+    timings = get_startup_timings()
+    if name == "eager":
+        backend = load_backend("eager", weights_path, DEVICE, model=load_trained_model(weights_path, version))
+    else:
+        start = time.perf_counter()
+        try:
+            backend = load_backend(name, weights_path, DEVICE)
+        except (FileNotFoundError, RuntimeError) as e:
+            st.error(f"❌ {e}")
+            st.stop()
+        timings[f"load_{name}"] = time.perf_counter() - start
+    # First forward pays for lazy kernel/allocator setup; do it before a user waits on it
+    start = time.perf_counter()
+    backend(torch.zeros(1, 3, *IMG_SIZE))
+    timings[f"warmup_{name}"] = time.perf_counter() - start
+    return backend
+
+@st.cache_resource
+def get_inference_service(name, weights_path=MODEL_PATH, version=None, tta_rule=None):
+    # Shared by every Streamlit session, so requests from all users get batched together
+    backend = load_inference_backend(name, weights_path, version)
+    if tta_rule:
+        # Every view of every queued scan goes through one forward pass
+        backend = TTABackend(backend, tta_rule)
+    return MicroBatcher(backend, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS)
+
+@st.cache_resource
+def get_trace_profiler():
+    # One Chrome trace per server process (it stops itself after PROFILE_STEPS requests).
+    # Stage totals use a fresh profiler per request, so concurrent sessions never mix them.
+    return StageProfiler(PROFILE, TRACE_DIR, trace_wait=0, trace_warmup=1, trace_active=PROFILE_STEPS, name="serve")
+
+@st.cache_resource
+def get_prediction_cache(weights_path=MODEL_PATH, version=None):
+    # Keyed by image content + weights hash; a new .pth invalidates old entries.
+    # The namespace is pinned to the version the serving model was loaded from.
+    # One subfolder per model, so teacher and student never clear each other's entries.
+    disk_dir = os.path.join(CACHE_DIR, os.path.splitext(os.path.basename(weights_path))[0]) if CACHE_DIR else None
+    return PredictionCache(weights_path, disk_dir=disk_dir, max_disk_mb=CACHE_DISK_MB,
+                           weights_hash=get_weights_hash(weights_path, version))
 
 # --- 3. PREPROCESSING ---
-def preprocess_image(image):
-    transform = transforms.Compose([
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
-        transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
-    ])
-    return transform(image).unsqueeze(0).to(DEVICE)
+def preprocess_image(image_bytes):
+    # Raw upload bytes -> uint8 tensor -> resized + normalised, no PIL round trip.
+    # Stays on CPU: the inference service stacks requests and moves the batch.
+    return normalize_batch(load_uint8(image_bytes).unsqueeze(0))
 
 # --- 4. UI INTERFACE ---
 st.set_page_config(page_title="Brain Tumor AI", page_icon="🧠")
@@ -52,25 +138,71 @@ st.set_page_config(page_title="Brain Tumor AI", page_icon="🧠")
 st.title("🧠 Brain Tumor Diagnostic Engine")
 st.write("Using **EfficientNet-B0 + Attention Mechanism** for high-precision MRI analysis.")
 
-# Alphabetical order as per ImageFolder
-CLASS_NAMES = ['Glioma', 'Meningioma', 'No Tumor', 'Pituitary']
+# Only offer the student once distill.py has produced it
+available_models = [name for name, path in MODELS.items() if name == list(MODELS)[0] or os.path.exists(path)]
+model_name = st.sidebar.selectbox(
+    "Model", available_models,
+    index=available_models.index(DEFAULT_MODEL) if DEFAULT_MODEL in available_models else 0,
+)
+weights_path = MODELS[model_name]
+weights_ver = weights_version(weights_path)
+
+backend_name = st.sidebar.selectbox(
+    "Inference Backend", BACKENDS,
+    index=BACKENDS.index(DEFAULT_BACKEND) if DEFAULT_BACKEND in BACKENDS else 0,
+)
+
+tta_mode = st.sidebar.selectbox(
+    "Test-Time Augmentation", TTA_MODES,
+    index=TTA_MODES.index(DEFAULT_TTA) if DEFAULT_TTA in TTA_MODES else 0,
+)
+tta_rule = st.sidebar.selectbox("TTA Aggregation", RULES, disabled=tta_mode == "off")
 
 uploaded_file = st.file_uploader("Upload an MRI Scan (JPG/PNG)...", type=["jpg", "jpeg", "png"])
 
 if uploaded_file is not None:
-    # Display Image
-    img = Image.open(uploaded_file).convert('RGB')
-    st.image(img, caption='Uploaded MRI', width=300)
+    # Display Image (raw bytes, no decode needed)
+    image_bytes = uploaded_file.getvalue()
+    st.image(image_bytes, caption='Uploaded MRI', width=300)
+    
+    # Reruns and repeat uploads of the same scan skip decode + forward entirely
+    cache = get_prediction_cache(weights_path, weights_ver)
+    probabilities = cache.get(image_bytes, backend_name)
+    input_tensor = None
     
-    # Load model and predict
-    model = load_trained_model()
+    if probabilities is None:
+        # Load model and predict
+        service = get_inference_service(backend_name, weights_path, weights_ver)
+        
+        trace = get_trace_profiler()  # Started before the stages so they land in the trace
+        prof = StageProfiler(PROFILE)
+        
+        with st.spinner('Analyzing spatial features...'):
+            with prof.stage("decode_transform"):
+                input_tensor = preprocess_image(image_bytes)
+            # Includes the micro-batch wait: this is the latency the user sees
+            with prof.stage("forward"):
+                probabilities = service.predict(input_tensor)
+        cache.put(image_bytes, probabilities, backend_name)
+        trace.step()
+        prof.report("request")
+
+    # TTA on top of the plain prediction, for every scan or only borderline ones
+    use_tta = tta_mode == "always" or (tta_mode == "borderline" and probabilities.max().item() < TTA_THRESHOLD)
+    if use_tta:
+        tta_variant = f"{backend_name}+tta-{tta_rule}"
+        tta_probs = cache.get(image_bytes, tta_variant)
+        if tta_probs is None:
+            if input_tensor is None:
+                input_tensor = preprocess_image(image_bytes)
+            start = time.perf_counter()
+            with st.spinner('Borderline scan: scoring augmented views...'):
+                tta_probs = get_inference_service(backend_name, weights_path, weights_ver, tta_rule).predict(input_tensor)
+            cache.put(image_bytes, tta_probs, tta_variant)
+            st.caption(f"🔁 TTA ({tta_rule}) added {1000 * (time.perf_counter() - start):.0f} ms")
+        probabilities = tta_probs
     
-    with st.spinner('Analyzing spatial features...'):
-        input_tensor = preprocess_image(img)
-        with torch.no_grad():
-            output = model(input_tensor)
-            probabilities = torch.nn.functional.softmax(output[0], dim=0)
-            confidence, predicted_idx = torch.max(probabilities, 0)
+    confidence, predicted_idx = torch.max(probabilities, 0)
 
     # --- 5. RESULTS DISPLAY ---
     st.divider()
@@ -88,4 +220,19 @@ if uploaded_file is not None:
         cols[0].write(name)
         cols[1].progress(probabilities[i].item())
 
-st.sidebar.info("Model: EfficientNet-B0 + SE-Attention\nTarget Recall: 99.49%")
\ No newline at end of file
+st.sidebar.info(f"Model: {model_name.split(' (')[0]} + SE-Attention\nTarget Recall: 99.49%")
+
+# --- 6. STARTUP TIMING ---
+startup = get_startup_timings()
+if len(startup) > 1:
+    st.sidebar.markdown(f"**Cold Start** ({sum(startup.values()):.2f} s)")
+    st.sidebar.caption(" • ".join(f"{name} {t:.2f} s" for name, t in startup.items()))
+
+# --- 7. CACHE STATS ---
+cache_stats = get_prediction_cache(weights_path, weights_ver).stats()
+st.sidebar.markdown("**Prediction Cache**")
+c1, c2 = st.sidebar.columns(2)
+c1.metric("Hits", cache_stats["memory_hits"] + cache_stats["disk_hits"])
+c2.metric("Misses", cache_stats["misses"])
+st.sidebar.caption(f"Hit rate {cache_stats['hit_rate']*100:.0f}% • "
+                   f"{cache_stats['memory_hits']} memory / {cache_stats['disk_hits']} disk")
\ No newline at end of file
@@ -0,0 +1,95 @@
+import os
+
+import torch
+
+from model import load_inference_model
+
+# --- PATHS ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "brain_tumor_attention_v1.pth")
+DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+BACKENDS = ["eager", "torchscript", "onnx", "int8"]
+
+
+def export_paths(weights_path=MODEL_PATH):
+    # Exported artefacts live next to the .pth they were exported from
+    stem = os.path.splitext(weights_path)[0]
+    return {"torchscript": stem + ".ts", "onnx": stem + ".onnx", "int8": stem + ".int8.ts"}
+
+
+def load_model(weights_path=MODEL_PATH, device=DEVICE, timings=None):
+    if not os.path.exists(weights_path):
+        raise FileNotFoundError(f"Weights file not found at {weights_path}")
+    return load_inference_model(weights_path, device, timings=timings)
+
+
+# --- BACKENDS ---
+# Every backend is a callable: float (B, 3, 224, 224) tensor in, logits tensor out.
+class EagerBackend:
+    name = "eager"
+
+    def __init__(self, model, device=DEVICE):
+        self.model = model
+        self.device = device
+
+    def __call__(self, images):
+        with torch.no_grad():
+            return self.model(images.to(self.device))
+
+
+class TorchScriptBackend:
+    name = "torchscript"
+
+    def __init__(self, path, device=DEVICE):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"TorchScript export not found at {path}. Run export.py / quantize.py first.")
+        self.model = torch.jit.load(path, map_location=device)
+        self.model.eval()
+        self.device = device
+
+    def __call__(self, images):
+        with torch.no_grad():
+            return self.model(images.to(self.device))
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, path, num_threads=None):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"ONNX export not found at {path}. Run export.py first.")
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("The onnx backend needs onnxruntime: pip install onnxruntime")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, images):
+        # ONNX Runtime serves on CPU only
+        feed = {self.input_name: images.detach().cpu().contiguous().numpy()}
+        return torch.from_numpy(self.session.run(None, feed)[0])
+
+
+def load_backend(name="eager", weights_path=MODEL_PATH, device=DEVICE, model=None):
+    if name == "eager":
+        return EagerBackend(model or load_model(weights_path, device), device)
+    paths = export_paths(weights_path)
+    if name == "torchscript":
+        return TorchScriptBackend(paths["torchscript"], device)
+    if name == "onnx":
+        return OnnxBackend(paths["onnx"])
+    if name == "int8":
+        # Quantized kernels are CPU-only (see quantize.py)
+        from quantize import ENGINE
+        torch.backends.quantized.engine = ENGINE
+        backend = TorchScriptBackend(paths["int8"], torch.device("cpu"))
+        backend.name = "int8"
+        return backend
+    raise ValueError(f"Unknown backend '{name}'. Choose from: {', '.join(BACKENDS)}")
@@ -0,0 +1,195 @@
+import argparse
+import csv
+import json
+import os
+
+import torch
+from torch.utils.data import Dataset, DataLoader
+from tqdm import tqdm
+
+from backends import BACKENDS, MODEL_PATH, load_backend
+from preprocess import CLASS_NAMES, IMAGE_EXTENSIONS, IMG_SIZE, load_uint8, normalize_batch
+
+# --- PATHS & DEFAULTS ---
+DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+BATCH_SIZE = 64
+NUM_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+CSV_FIELDS = ["path", "status", "prediction", "confidence"] + CLASS_NAMES
+
+
+# --- INPUT DISCOVERY ---
+def collect_images(inputs):
+    # Accepts directories (scanned recursively), single images, or .txt files
+    # holding one image path per line. Order is stable so reruns line up.
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        paths.append(os.path.abspath(os.path.join(root, name)))
+        elif item.lower().endswith(".txt"):
+            with open(item) as f:
+                paths.extend(os.path.abspath(line.strip()) for line in f if line.strip())
+        else:
+            paths.append(os.path.abspath(item))
+
+    # Drop duplicates but keep first-seen order
+    return list(dict.fromkeys(paths))
+
+
+class ScanDataset(Dataset):
+    def __init__(self, paths):
+        self.paths = paths
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, idx):
+        # Decode + resize happen here, inside the DataLoader workers; the
+        # batch travels as uint8 and is normalised once in the main loop.
+        try:
+            return load_uint8(self.paths[idx]), idx, True
+        except Exception:
+            # Corrupt / unreadable scan: keep the batch shape, flag it
+            return torch.zeros(3, *IMG_SIZE, dtype=torch.uint8), idx, False
+
+
+# --- RESUMABLE OUTPUT ---
+def _repair_tail(path):
+    # A crash can leave half a line at the end of the file. Cut back to the
+    # last complete line so appended rows start clean.
+    with open(path, "rb+") as f:
+        data = f.read()
+        if not data or data.endswith(b"\n"):
+            return
+        f.truncate(data.rfind(b"\n") + 1)
+
+
+def load_done(path, fmt):
+    done = set()
+    if not os.path.exists(path):
+        return done
+
+    _repair_tail(path)
+    with open(path, newline="") as f:
+        if fmt == "jsonl":
+            for line in f:
+                try:
+                    done.add(json.loads(line)["path"])
+                except (ValueError, KeyError):
+                    continue
+        else:
+            for row in csv.DictReader(f):
+                if row.get("path"):
+                    done.add(row["path"])
+    return done
+
+
+class ResultWriter:
+    def __init__(self, path, fmt):
+        self.fmt = fmt
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(path, "a", newline="")
+        if fmt == "csv":
+            self.writer = csv.DictWriter(self.file, fieldnames=CSV_FIELDS)
+            if new_file:
+                self.writer.writeheader()
+
+    def write(self, rows):
+        for row in rows:
+            if self.fmt == "jsonl":
+                self.file.write(json.dumps(row) + "\n")
+            else:
+                self.writer.writerow(row)
+        # Flush every batch so a crash loses at most the batch in flight
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+def _rows_for_batch(paths, probs, ok):
+    rows = []
+    for path, p, good in zip(paths, probs, ok):
+        row = {"path": path}
+        if good:
+            confidence, idx = torch.max(p, 0)
+            row.update(status="ok", prediction=CLASS_NAMES[idx], confidence=round(confidence.item(), 6))
+            row.update({name: round(v, 6) for name, v in zip(CLASS_NAMES, p.tolist())})
+        else:
+            row.update(status="unreadable", prediction="", confidence="")
+            row.update({name: "" for name in CLASS_NAMES})
+        rows.append(row)
+    return rows
+
+
+# --- PYTHON API ---
+def score_images(inputs, output_path, backend=None, batch_size=BATCH_SIZE, num_workers=NUM_WORKERS,
+                 fmt=None, resume=True, device=DEVICE):
+    # `backend` is any callable from backends.load_backend (eager / torchscript / onnx)
+    fmt = fmt or ("jsonl" if output_path.endswith(".jsonl") else "csv")
+    backend = backend or load_backend("eager", device=device)
+
+    paths = collect_images(inputs)
+    if resume:
+        done = load_done(output_path, fmt)
+        paths = [p for p in paths if p not in done]
+    elif os.path.exists(output_path):
+        os.remove(output_path)
+
+    if not paths:
+        print("✅ Nothing to score (all inputs already present in the output).")
+        return 0
+
+    loader = DataLoader(
+        ScanDataset(paths),
+        batch_size=batch_size,
+        shuffle=False,
+        num_workers=num_workers,
+        pin_memory=device.type == "cuda",
+        persistent_workers=num_workers > 0,
+    )
+
+    writer = ResultWriter(output_path, fmt)
+    scored = 0
+    try:
+        with torch.no_grad():
+            for images, idxs, ok in tqdm(loader, desc="Scoring", unit="batch"):
+                probs = torch.softmax(backend(normalize_batch(images, device)).float(), dim=1).cpu()
+                batch_paths = [paths[i] for i in idxs.tolist()]
+                writer.write(_rows_for_batch(batch_paths, probs, ok.tolist()))
+                scored += len(batch_paths)
+    finally:
+        writer.close()
+    return scored
+
+
+# --- CLI ---
+def parse_args():
+    parser = argparse.ArgumentParser(description="Batch-score MRI scans with BrainTumorModel.")
+    parser.add_argument("inputs", nargs="+", help="Image directories, image files, or .txt lists of paths")
+    parser.add_argument("-o", "--output", required=True, help="Output file (.csv or .jsonl)")
+    parser.add_argument("--weights", default=MODEL_PATH)
+    parser.add_argument("--backend", choices=BACKENDS, default="eager")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS)
+    parser.add_argument("--format", choices=["csv", "jsonl"], default=None)
+    parser.add_argument("--no-resume", action="store_true", help="Overwrite the output instead of resuming")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(f"🚀 Batch scoring on: {DEVICE} ({args.backend} backend)")
+    backend = load_backend(args.backend, args.weights)
+    total = score_images(
+        args.inputs, args.output, backend=backend, batch_size=args.batch_size,
+        num_workers=args.workers, fmt=args.format, resume=not args.no_resume,
+    )
+    print(f"🎉 Scored {total} images -> {args.output}")
@@ -0,0 +1,204 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+# Heavy imports (torch, PIL) happen inside the worker so startup time is
+# measured the same way a real serving process pays for it.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_PATH = os.path.join(BASE_DIR, "benchmark_results.json")
+
+BATCH_SIZES = [1, 8, 32]
+THREADS = sorted({1, max(1, (os.cpu_count() or 1) // 2), os.cpu_count() or 1})
+BACKENDS = ["eager", "torchscript", "int8"]
+PIPELINES = ["pil", "tensor"]
+RAW_SIZE = 512  # Side of the synthetic "scan" fed to the input pipeline
+WARMUP = 3
+ITERS = 20
+REGRESSION_PCT = 10.0
+
+
+# --- WORKER (one config per process) ---
+def _build_backend(name, torch, model, example):
+    if name == "eager":
+        return model
+    if name == "torchscript":
+        with torch.no_grad():
+            return torch.jit.freeze(torch.jit.trace(model, example))
+    if name == "int8":
+        from quantize import ENGINE, quantize_model
+        if ENGINE not in torch.backends.quantized.supported_engines:
+            return None
+        # Random calibration data is fine: only speed is measured here
+        calib = [(torch.randn(8, *example.shape[1:]), None) for _ in range(4)]
+        qmodel = quantize_model(model, calib, num_batches=len(calib))
+        with torch.no_grad():
+            return torch.jit.freeze(torch.jit.trace(qmodel, example))
+    raise ValueError(name)
+
+
+def _build_pipeline(name, torch, batch_size, raw_size):
+    import numpy as np
+    from preprocess import get_transform, preprocess_batch
+
+    rng = np.random.default_rng(0)
+    raw = rng.integers(0, 256, size=(batch_size, raw_size, raw_size, 3), dtype=np.uint8)
+
+    if name == "pil":
+        from PIL import Image
+        images = [Image.fromarray(a) for a in raw]
+        transform = get_transform()
+        return lambda: torch.stack([transform(img) for img in images])
+
+    if name == "tensor":
+        batch = torch.from_numpy(raw).permute(0, 3, 1, 2).contiguous()
+        return lambda: preprocess_batch(batch)
+    raise ValueError(name)
+
+
+def run_worker(config):
+    import resource
+    import numpy as np
+    import torch
+    from model import BrainTumorModel
+    from preprocess import IMG_SIZE
+
+    torch.set_num_threads(config["threads"])
+    torch.manual_seed(0)
+    model = BrainTumorModel(num_classes=4, pretrained=False).eval()
+    example = torch.randn(1, 3, *IMG_SIZE)
+    backend = _build_backend(config["backend"], torch, model, example)
+    if backend is None:
+        return {**config, "skipped": "quantized engine not available"}
+    pipeline = _build_pipeline(config["pipeline"], torch, config["batch_size"], config["raw_size"])
+    ready = time.time()
+
+    latencies = []
+    with torch.no_grad():
+        for i in range(config["warmup"] + config["iters"]):
+            start = time.perf_counter()
+            backend(pipeline())
+            elapsed = time.perf_counter() - start
+            if i >= config["warmup"]:
+                latencies.append(elapsed)
+
+    lat_ms = np.array(latencies) * 1000
+    return {
+        **config,
+        "ready_time": ready,
+        "p50_ms": float(np.percentile(lat_ms, 50)),
+        "p95_ms": float(np.percentile(lat_ms, 95)),
+        "p99_ms": float(np.percentile(lat_ms, 99)),
+        "images_per_sec": config["batch_size"] * len(lat_ms) / (lat_ms.sum() / 1000),
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+# --- DRIVER ---
+def config_key(c):
+    return f"{c['backend']}/{c['pipeline']}/bs{c['batch_size']}/t{c['threads']}"
+
+
+def run_matrix(batch_sizes, threads, backends, pipelines, raw_size=RAW_SIZE, warmup=WARMUP, iters=ITERS):
+    results = []
+    matrix = list(itertools.product(backends, pipelines, batch_sizes, threads))
+    for i, (backend, pipeline, bs, t) in enumerate(matrix, 1):
+        config = {"backend": backend, "pipeline": pipeline, "batch_size": bs, "threads": t,
+                  "raw_size": raw_size, "warmup": warmup, "iters": iters}
+        spawn = time.time()
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", json.dumps(config)],
+            capture_output=True, text=True, cwd=BASE_DIR,
+        )
+        if proc.returncode != 0:
+            print(f"❌ [{i}/{len(matrix)}] {config_key(config)} failed:\n{proc.stderr.strip()[-500:]}")
+            results.append({**config, "error": proc.stderr.strip()[-500:]})
+            continue
+
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        if "ready_time" in result:
+            # Process start -> model built and ready (imports, construction, tracing)
+            result["startup_s"] = result.pop("ready_time") - spawn
+            print(f"✅ [{i}/{len(matrix)}] {config_key(result):<28} p50 {result['p50_ms']:8.2f} ms  "
+                  f"p99 {result['p99_ms']:8.2f} ms  {result['images_per_sec']:8.1f} img/s  "
+                  f"RSS {result['peak_rss_mb']:6.0f} MB  start {result['startup_s']:5.2f} s")
+        else:
+            print(f"⏭️ [{i}/{len(matrix)}] {config_key(config)} skipped: {result.get('skipped')}")
+        results.append(result)
+    return results
+
+
+def environment():
+    import torch
+    return {
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare(results, baseline, threshold_pct=REGRESSION_PCT):
+    # Regression = p50 latency up or throughput down by more than threshold_pct
+    base = {config_key(r): r for r in baseline["results"] if "p50_ms" in r}
+    regressions = []
+    for r in results:
+        b = base.get(config_key(r))
+        if not b or "p50_ms" not in r:
+            continue
+        lat_change = 100 * (r["p50_ms"] - b["p50_ms"]) / b["p50_ms"]
+        tput_change = 100 * (r["images_per_sec"] - b["images_per_sec"]) / b["images_per_sec"]
+        flag = lat_change > threshold_pct or tput_change < -threshold_pct
+        print(f"{'❌' if flag else '  '} {config_key(r):<28} p50 {lat_change:+6.1f}%   img/s {tput_change:+6.1f}%")
+        if flag:
+            regressions.append(config_key(r))
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Latency/throughput benchmark for BrainTumorModel (random weights, CPU).")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--threads", type=int, nargs="+", default=THREADS)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--pipelines", nargs="+", choices=PIPELINES, default=PIPELINES)
+    parser.add_argument("--raw-size", type=int, default=RAW_SIZE)
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--iters", type=int, default=ITERS)
+    parser.add_argument("-o", "--output", default=RESULTS_PATH)
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_PCT, help="Regression threshold in percent")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.worker:
+        print(json.dumps(run_worker(json.loads(args.worker))))
+        sys.exit(0)
+
+    print(f"🚀 Benchmarking BrainTumorModel (random weights) on {os.cpu_count()} CPUs")
+    results = run_matrix(args.batch_sizes, args.threads, args.backends, args.pipelines,
+                         args.raw_size, args.warmup, args.iters)
+    report = {"environment": environment(), "results": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Results saved: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\n📊 Compared with baseline {args.baseline} (threshold {args.threshold:.0f}%):")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ No regressions.")
@@ -0,0 +1,95 @@
+import os
+import random
+
+import numpy as np
+import torch
+
+
+# --- ATOMIC SAVE / LOAD ---
+def save_checkpoint(state, path):
+    # Write to a temp file and rename: a crash mid-save never leaves a
+    # truncated checkpoint where the last good one used to be.
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    torch.save(state, tmp)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path, device):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Checkpoint not found at {path}")
+    # Full checkpoints hold RNG/numpy state, so they are not weights_only
+    return torch.load(path, map_location=device, weights_only=False)
+
+
+# --- RNG STATE ---
+def capture_rng_state():
+    state = {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state(),
+    }
+    if torch.cuda.is_available():
+        state["cuda"] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def restore_rng_state(state):
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    torch.set_rng_state(state["torch"].cpu())
+    if "cuda" in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all([s.cpu() for s in state["cuda"]])
+
+
+# --- METRIC TRACKING ---
+class MetricTracker:
+    # Wraps the torchmetrics objects used by the epoch report: compute() then
+    # reset() once per epoch, remember the best value of `monitor` and count
+    # epochs without improvement for early stopping.
+    def __init__(self, metrics, monitor="recall", patience=5, min_delta=0.0):
+        self.metrics = metrics
+        self.monitor = monitor
+        self.patience = patience
+        self.min_delta = min_delta
+        self.best = float("-inf")
+        self.best_epoch = -1
+        self.bad_epochs = 0
+        self.history = []
+
+    def update(self, preds, labels):
+        for m in self.metrics.values():
+            m.update(preds, labels)
+
+    def compute(self):
+        return {name: m.compute().item() for name, m in self.metrics.items()}
+
+    def reset(self):
+        for m in self.metrics.values():
+            m.reset()
+
+    def end_epoch(self, epoch):
+        # Returns (results, improved)
+        results = self.compute()
+        self.reset()
+        self.history.append({"epoch": epoch, **results})
+
+        improved = results[self.monitor] > self.best + self.min_delta
+        if improved:
+            self.best, self.best_epoch, self.bad_epochs = results[self.monitor], epoch, 0
+        else:
+            self.bad_epochs += 1
+        return results, improved
+
+    @property
+    def should_stop(self):
+        return self.patience > 0 and self.bad_epochs >= self.patience
+
+    def state_dict(self):
+        return {"best": self.best, "best_epoch": self.best_epoch, "bad_epochs": self.bad_epochs, "history": self.history}
+
+    def load_state_dict(self, state):
+        self.best = state["best"]
+        self.best_epoch = state["best_epoch"]
+        self.bad_epochs = state["bad_epochs"]
+        self.history = state["history"]
@@ -0,0 +1,227 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+import torch.optim as optim
+from torch.utils.data import DataLoader, Dataset
+from torchmetrics.classification import MulticlassF1Score, MulticlassAccuracy, MulticlassPrecision, MulticlassRecall
+from tqdm import tqdm
+
+from checkpoint import MetricTracker, save_checkpoint
+from manifest import load_split
+from model import BrainTumorModel, load_inference_model
+from prediction_cache import file_digest
+from preprocess import IMG_SIZE, normalize_batch
+from tensor_cache import fingerprint
+
+# --- PATHS ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_ROOT = os.path.abspath(os.path.join(BASE_DIR, "..", "data"))
+LOGIT_ROOT = os.path.join(DATA_ROOT, "teacher_logits")
+TEACHER_PATH = os.path.join(BASE_DIR, "brain_tumor_attention_v1.pth")
+STUDENT_PATH = os.path.join(BASE_DIR, "brain_tumor_student_v1.pth")
+
+# --- CONFIGURATION ---
+DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+STUDENT_BACKBONE = "mobilenet_v3_small"
+BATCH_SIZE = 32
+EPOCHS = 30
+LEARNING_RATE = 0.001
+TEMPERATURE = 4.0
+ALPHA = 0.7  # Weight of the soft (teacher) loss; 1 - ALPHA goes to the hard labels
+PATIENCE = 6
+NUM_WORKERS = 2
+LATENCY_RUNS = 50
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Distil BrainTumorModel into a MobileNetV3-Small student for CPU serving.")
+    parser.add_argument("--teacher", default=TEACHER_PATH)
+    parser.add_argument("--output", default=STUDENT_PATH)
+    parser.add_argument("--backbone", default=STUDENT_BACKBONE)
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--lr", type=float, default=LEARNING_RATE)
+    parser.add_argument("--temperature", type=float, default=TEMPERATURE)
+    parser.add_argument("--alpha", type=float, default=ALPHA)
+    parser.add_argument("--patience", type=int, default=PATIENCE)
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS)
+    parser.add_argument("--report-only", action="store_true", help="Skip training, print the trade-off table")
+    return parser.parse_args()
+
+
+# --- TEACHER LOGIT CACHE ---
+# Training images are not augmented, so the teacher's output per image never
+# changes: compute it once, reuse it every epoch (and every distillation run).
+def _samples(dataset):
+    if hasattr(dataset, "paths"):
+        return list(zip(dataset.paths, np.asarray(dataset.targets).tolist()))
+    return dataset.samples
+
+
+def teacher_logits(teacher_path, split, dataset, device, batch_size=64, logit_root=LOGIT_ROOT):
+    key = file_digest(teacher_path) + ":" + fingerprint(_samples(dataset), dataset.classes)
+    cache_dir = os.path.join(logit_root, split)
+    meta_path = os.path.join(cache_dir, "meta.json")
+    try:
+        with open(meta_path) as f:
+            if json.load(f).get("key") == key:
+                return np.load(os.path.join(cache_dir, "logits.npy"))
+    except (OSError, ValueError):
+        pass
+
+    print(f"🔄 Teacher logits for '{split}' are stale or missing. Running the teacher once...")
+    teacher = load_inference_model(teacher_path, device)
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=False, num_workers=NUM_WORKERS)
+    chunks = []
+    with torch.no_grad():
+        for images, _ in tqdm(loader, desc=f"Teacher [{split}]"):
+            chunks.append(teacher(normalize_batch(images, device)).float().cpu())
+    logits = torch.cat(chunks).numpy()
+
+    os.makedirs(cache_dir, exist_ok=True)
+    np.save(os.path.join(cache_dir, "logits.npy"), logits)
+    with open(meta_path, "w") as f:
+        json.dump({"key": key, "count": len(logits), "teacher": teacher_path}, f)
+    return logits
+
+
+class IndexedDataset(Dataset):
+    # (image, label, index): the index looks up the cached teacher logits
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, idx):
+        img, label = self.dataset[idx]
+        return img, label, idx
+
+
+def distillation_loss(student_logits, teacher_logits, labels, temperature, alpha):
+    # Hinton et al.: KL between softened distributions, scaled by T^2 so its
+    # gradients stay comparable to the hard-label cross-entropy
+    soft = F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=1),
+        F.softmax(teacher_logits / temperature, dim=1),
+        reduction="batchmean",
+    ) * temperature ** 2
+    hard = F.cross_entropy(student_logits, labels)
+    return alpha * soft + (1 - alpha) * hard
+
+
+# --- TRAINING ---
+def train_student(args):
+    try:
+        train_dataset = load_split("train", uint8=True)
+        val_dataset = load_split("val", uint8=True)
+    except FileNotFoundError:
+        print(f"❌ Error: Data folder not found at {DATA_ROOT}.")
+        exit()
+    if not os.path.exists(args.teacher):
+        print(f"❌ Error: Teacher weights not found at {args.teacher}")
+        exit()
+
+    cached = torch.from_numpy(teacher_logits(args.teacher, "train", train_dataset, DEVICE)).to(DEVICE)
+
+    loader_kwargs = dict(batch_size=args.batch_size, num_workers=args.workers, persistent_workers=args.workers > 0)
+    train_loader = DataLoader(IndexedDataset(train_dataset), shuffle=True, **loader_kwargs)
+    val_loader = DataLoader(val_dataset, **loader_kwargs)
+
+    model = BrainTumorModel(num_classes=4, backbone=args.backbone).to(DEVICE)
+    optimizer = optim.Adam(model.parameters(), lr=args.lr)
+    scheduler = optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=args.epochs)
+    tracker = MetricTracker({
+        "f1": MulticlassF1Score(num_classes=4, average='macro').to(DEVICE),
+        "accuracy": MulticlassAccuracy(num_classes=4).to(DEVICE),
+        "precision": MulticlassPrecision(num_classes=4, average='macro').to(DEVICE),
+        "recall": MulticlassRecall(num_classes=4, average='macro').to(DEVICE),
+    }, monitor="recall", patience=args.patience)
+
+    print(f"🚀 Distilling into {args.backbone} on: {DEVICE} (T={args.temperature}, alpha={args.alpha})")
+    for epoch in range(args.epochs):
+        model.train()
+        running_loss = 0.0
+        start = time.perf_counter()
+        for images, labels, idx in tqdm(train_loader, desc=f"Epoch {epoch+1}/{args.epochs} [Distilling]"):
+            images = normalize_batch(images, DEVICE)
+            labels = labels.to(DEVICE)
+            optimizer.zero_grad(set_to_none=True)
+            loss = distillation_loss(model(images), cached[idx.to(DEVICE)], labels, args.temperature, args.alpha)
+            loss.backward()
+            optimizer.step()
+            running_loss += loss.item()
+        scheduler.step()
+
+        model.eval()
+        with torch.no_grad():
+            for images, labels in val_loader:
+                tracker.update(model(normalize_batch(images, DEVICE)), labels.to(DEVICE))
+        results, improved = tracker.end_epoch(epoch)
+
+        print(f"Epoch {epoch+1:>3}/{args.epochs}  loss {running_loss/len(train_loader):.4f}  "
+              f"acc {results['accuracy']:.4f}  f1 {results['f1']:.4f}  recall {results['recall']:.4f}  "
+              f"({time.perf_counter() - start:.0f} s){'  🏆' if improved else ''}")
+        if improved:
+            # Plain state_dict: loads in app.py / eval_test.py like the teacher's
+            save_checkpoint(model.state_dict(), args.output)
+        if tracker.should_stop:
+            print(f"⏹️ Early stopping: no recall improvement for {tracker.bad_epochs} epochs.")
+            break
+
+    print(f"\n🎉 Best recall {tracker.best:.4f} (epoch {tracker.best_epoch+1}). Student saved at: {args.output}")
+
+
+# --- TRADE-OFF REPORT ---
+def cpu_latency_ms(model, runs=LATENCY_RUNS):
+    # Single image on CPU: the clinic edge-box case
+    example = torch.randn(1, 3, *IMG_SIZE)
+    with torch.no_grad():
+        for _ in range(5):
+            model(example)
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            model(example)
+            times.append(time.perf_counter() - start)
+    return 1000 * float(np.median(times))
+
+
+def tradeoff_report(paths):
+    from eval_test import build_test_loader, evaluate
+
+    cpu = torch.device("cpu")
+    test_loader = build_test_loader()
+    rows = []
+    for label, path in paths:
+        if not os.path.exists(path):
+            print(f"⚠️ Skipping {label}: {path} not found")
+            continue
+        model = load_inference_model(path, cpu)
+        results = evaluate(model, test_loader, cpu)
+        rows.append((label, model.backbone, results["recall"], results["f1"], cpu_latency_ms(model),
+                     os.path.getsize(path) / 1e6, sum(p.numel() for p in model.parameters()) / 1e6))
+
+    print("\n" + "="*88)
+    print("RECALL / LATENCY / SIZE TRADE-OFF (test set, CPU, batch 1)")
+    print("="*88)
+    print(f"{'Model':<10}{'Backbone':<22}{'Recall':>9}{'F1':>9}{'Latency (ms)':>15}{'Size (MB)':>12}{'Params (M)':>12}")
+    for row in rows:
+        print(f"{row[0]:<10}{row[1]:<22}{row[2]:>9.4f}{row[3]:>9.4f}{row[4]:>15.2f}{row[5]:>12.1f}{row[6]:>12.2f}")
+    print("="*88)
+    if len(rows) == 2:
+        t, s = rows
+        print(f"Student: {t[4] / s[4]:.1f}x faster, {t[5] / s[5]:.1f}x smaller, recall {s[2] - t[2]:+.4f}")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not args.report_only:
+        train_student(args)
+    tradeoff_report([("Teacher", args.teacher), ("Student", args.output)])
@@ -1,57 +1,267 @@
+import time
+# Stamped before the heavy imports so the startup report includes them (same as app.py)
+_IMPORT_START = time.perf_counter()
 import torch
 import os
+import argparse
+import numpy as np
 from torch.utils.data import DataLoader
-from torchvision import datasets, transforms
 from torchmetrics.classification import MulticlassF1Score, MulticlassAccuracy, MulticlassRecall
-from model import BrainTumorModel # Import your specific architecture
+from model import load_inference_model # Import your specific architecture
+from manifest import load_split
+from preprocess import normalize_batch
+from backends import export_paths
+from profiling import StageProfiler
+from tta import DEFAULT_VIEWS, RULES, VIEWS, TTABackend
+from logit_analysis import (bootstrap, class_index, confusion_matrix, dataset_paths, load_logits,
+                            metrics_from_confusion, per_class_stats, save_logits, softmax, sweep_scores,
+                            threshold_sweep, torchmetrics_metric)
+IMPORT_S = time.perf_counter() - _IMPORT_START
 
 # 1. Setup Device and Paths
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(BASE_DIR, "brain_tumor_attention_v1.pth")
 TEST_PATH = os.path.abspath(os.path.join(BASE_DIR, "..", "data", "test"))
+TRACE_DIR = os.path.join(BASE_DIR, "traces")
+USE_TENSOR_CACHE = True
+# Max allowed drop in macro-recall for the INT8 model (absolute, 0.01 = 1 point)
+RECALL_TOLERANCE = 0.01
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Final evaluation of BrainTumorModel on the test split.")
+    parser.add_argument("--weights", default=MODEL_PATH,
+                        help="Teacher (default) or distilled student weights, e.g. brain_tumor_student_v1.pth")
+    parser.add_argument("--int8", action="store_true", help="Also evaluate the INT8 model side by side (CPU)")
+    parser.add_argument("--recall-tolerance", type=float, default=RECALL_TOLERANCE)
+    parser.add_argument("--profile", action="store_true", help="Per-stage timing + Chrome trace of the eval loop")
+    parser.add_argument("--profile-steps", type=int, default=5, help="Batches captured in the Chrome trace (0 = none)")
+    parser.add_argument("--trace-dir", default=TRACE_DIR)
+    # Logit store: every run saves per-sample logits; --analyze works from that file alone
+    parser.add_argument("--logits", default=None,
+                        help="Logit store written by each run / read by --analyze (default: <weights>_logits.npz)")
+    parser.add_argument("--analyze", action="store_true", help="Recompute metrics from the stored logits, no model run")
+    parser.add_argument("--metrics", nargs="*", default=[],
+                        help="Extra torchmetrics.classification metrics by class name, e.g. MulticlassAUROC")
+    parser.add_argument("--bootstrap", type=int, default=2000, help="Bootstrap replicates for the CIs (0 = off)")
+    parser.add_argument("--ci", type=float, default=0.95)
+    parser.add_argument("--sweep", default="tumor",
+                        help="Threshold sweep target: 'tumor' (any tumour vs no_tumor) or a class, e.g. glioma")
+    parser.add_argument("--seed", type=int, default=0)
+    # Test-time augmentation: all views of a batch scored in one forward pass
+    parser.add_argument("--tta", choices=RULES, help="Also evaluate with TTA, aggregating views with this rule")
+    parser.add_argument("--tta-views", nargs="+", choices=VIEWS, default=DEFAULT_VIEWS)
+    return parser.parse_args()
+
 
 # 2. Define Model and Load Weights
-model = BrainTumorModel(num_classes=4).to(DEVICE)
-if os.path.exists(MODEL_PATH):
-    model.load_state_dict(torch.load(MODEL_PATH, map_location=DEVICE))
-    print(f"✅ Loaded weights from: {MODEL_PATH}")
-else:
-    print(f"❌ Error: Weights file not found at {MODEL_PATH}")
-    exit()
+def load_fp32_model(device, timings=None, weights_path=MODEL_PATH):
+    # No ImageNet download: the checkpoint overwrites every weight anyway.
+    # The backbone (teacher or distilled student) is read off the checkpoint.
+    if not os.path.exists(weights_path):
+        print(f"❌ Error: Weights file not found at {weights_path}")
+        exit()
+    model = load_inference_model(weights_path, device, timings=timings)
+    print(f"✅ Loaded {model.backbone} weights from: {weights_path}")
+    return model
+
+
+def print_startup(timings):
+    print(f"\n⏱️ Startup: {sum(timings.values()):.2f} s  (" +
+          ", ".join(f"{name} {t:.2f} s" for name, t in timings.items()) + ")")
+
 
 # 3. Data Loader for Test Set
-transform = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
-    transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
-])
-
-test_dataset = datasets.ImageFolder(TEST_PATH, transform=transform)
-test_loader = DataLoader(test_dataset, batch_size=16, shuffle=False)
-
-# 4. Initialize Metrics
-f1_metric = MulticlassF1Score(num_classes=4, average='macro').to(DEVICE)
-acc_metric = MulticlassAccuracy(num_classes=4).to(DEVICE)
-rec_metric = MulticlassRecall(num_classes=4, average='macro').to(DEVICE)
-
-# 5. Evaluation Loop
-print(f"🚀 Starting final evaluation on Test Set...")
-model.eval()
-with torch.no_grad():
-    for images, labels in test_loader:
-        images, labels = images.to(DEVICE), labels.to(DEVICE)
-        preds = model(images)
-        
-        f1_metric.update(preds, labels)
-        acc_metric.update(preds, labels)
-        rec_metric.update(preds, labels)
-
-# 6. Final Results for Resume
-print("\n" + "="*30)
-print("FINAL TEST RESULTS")
-print("="*30)
-print(f"Final Accuracy:  {acc_metric.compute():.4f}")
-print(f"Final F1 Score:  {f1_metric.compute():.4f}")
-print(f"Final Recall:    {rec_metric.compute():.4f}") # Critical for medical AI
-print("="*30)
\ No newline at end of file
+def build_test_loader():
+    # uint8 images from the loader; evaluate() normalises each batch in one go
+    try:
+        test_dataset = load_split("test", USE_TENSOR_CACHE, uint8=True)
+    except FileNotFoundError:
+        print(f"❌ Error: Test split not found (no manifest test rows or folder at {TEST_PATH})")
+        exit()
+    return DataLoader(test_dataset, batch_size=16, shuffle=False)
+
+
+# 4. Evaluation Loop
+def evaluate(model, test_loader, device, prof=None):
+    prof = prof or StageProfiler(enabled=False)
+    f1_metric = MulticlassF1Score(num_classes=4, average='macro').to(device)
+    acc_metric = MulticlassAccuracy(num_classes=4).to(device)
+    rec_metric = MulticlassRecall(num_classes=4, average='macro').to(device)
+
+    forward_time, seen = 0.0, 0
+    all_logits, all_labels = [], []
+    with torch.no_grad():
+        for images, labels in prof.iter(test_loader):
+            with prof.stage("host_to_device"):
+                images, labels = images.to(device), labels.to(device)
+            with prof.stage("decode_transform"):
+                images = normalize_batch(images)
+            with prof.stage("forward"):
+                start = time.perf_counter()
+                preds = model(images)
+                if device.type == "cuda":
+                    torch.cuda.synchronize()
+                forward_time += time.perf_counter() - start
+            seen += images.size(0)
+
+            with prof.stage("metric_update"):
+                f1_metric.update(preds, labels)
+                acc_metric.update(preds, labels)
+                rec_metric.update(preds, labels)
+                all_logits.append(preds.float().cpu())
+                all_labels.append(labels.cpu())
+            prof.step()
+
+    return {
+        "accuracy": acc_metric.compute().item(),
+        "f1": f1_metric.compute().item(),
+        "recall": rec_metric.compute().item(),
+        "latency_ms": 1000 * forward_time / max(1, seen),
+        "logits": torch.cat(all_logits).numpy(),
+        "labels": torch.cat(all_labels).numpy(),
+    }
+
+
+# 5. Final Results for Resume
+def print_results(results):
+    print("\n" + "="*30)
+    print("FINAL TEST RESULTS")
+    print("="*30)
+    print(f"Final Accuracy:  {results['accuracy']:.4f}")
+    print(f"Final F1 Score:  {results['f1']:.4f}")
+    print(f"Final Recall:    {results['recall']:.4f}") # Critical for medical AI
+    print(f"Latency:         {results['latency_ms']:.2f} ms/img")
+    print("="*30)
+
+
+def print_comparison(fp32, int8, fp32_mb=None, int8_mb=None, names=("FP32", "INT8"), title="FP32 vs INT8 (CPU)"):
+    print("\n" + "="*52)
+    print(title)
+    print("="*52)
+    print(f"{'':<16}{names[0]:>12}{names[1]:>12}{'Δ':>12}")
+    for key, label in [("accuracy", "Accuracy"), ("f1", "F1 Score"), ("recall", "Recall")]:
+        print(f"{label:<16}{fp32[key]:>12.4f}{int8[key]:>12.4f}{int8[key] - fp32[key]:>+12.4f}")
+    print(f"{'Latency (ms)':<16}{fp32['latency_ms']:>12.2f}{int8['latency_ms']:>12.2f}"
+          f"{int8['latency_ms'] - fp32['latency_ms']:>+12.2f}")
+    if fp32_mb is not None:
+        print(f"{'Size (MB)':<16}{fp32_mb:>12.1f}{int8_mb:>12.1f}{int8_mb - fp32_mb:>+12.1f}")
+    print("="*52)
+
+
+# 6. Analysis from the logit store (no model, no images)
+def analyze(args):
+    try:
+        store = load_logits(args.logits)
+    except FileNotFoundError as e:
+        print(f"❌ Error: {e}")
+        exit(1)
+    logits, labels, classes = store["logits"], store["labels"], store["classes"]
+    probs = softmax(logits)
+    preds = probs.argmax(axis=1)
+    num_classes = len(classes)
+    print(f"📂 {len(labels)} samples from {args.logits} (model: {store['model'] or 'unknown'})")
+
+    cm = confusion_matrix(labels, preds, num_classes)
+    point = metrics_from_confusion(cm)
+    cis = bootstrap(labels, preds, num_classes, args.bootstrap, args.ci, args.seed) if args.bootstrap > 0 else {}
+
+    print("\n" + "="*52)
+    title = f"METRICS ({args.ci:.0%} bootstrap CI, n={args.bootstrap})" if cis else "METRICS"
+    print(title)
+    print("="*52)
+    for key in ["accuracy", "micro_accuracy", "precision", "recall", "f1", "specificity"]:
+        ci = f"  [{cis[key][0]:.4f}, {cis[key][1]:.4f}]" if cis else ""
+        print(f"{key:<16}{point[key]:>10.4f}{ci}")
+    for name in args.metrics:
+        try:
+            value = torchmetrics_metric(name, logits, labels, num_classes)
+        except (ValueError, TypeError) as e:
+            print(f"⚠️ {e}")
+            continue
+        print(f"{name:<16}{np.array2string(value.numpy(), precision=4)}")
+
+    print("\nConfusion matrix (rows = true, cols = predicted):")
+    print(" " * 14 + "".join(f"{c[:10]:>12}" for c in classes))
+    for i, c in enumerate(classes):
+        print(f"{c[:14]:<14}" + "".join(f"{v:>12d}" for v in cm[i]))
+
+    stats = per_class_stats(cm)
+    print(f"\n{'Per class':<14}{'TP':>7}{'FP':>7}{'FN':>7}{'TN':>7}{'Recall':>10}{'Precision':>11}")
+    for i, c in enumerate(classes):
+        ci = f"  [{cis['per_class_recall'][0][i]:.3f}, {cis['per_class_recall'][1][i]:.3f}]" if cis else ""
+        print(f"{c[:14]:<14}" + "".join(f"{int(stats[k][i]):>7d}" for k in ["tp", "fp", "fn", "tn"]) +
+              f"{point['per_class_recall'][i]:>10.4f}{point['per_class_precision'][i]:>11.4f}{ci}")
+
+    if args.sweep != "tumor":
+        try:
+            class_index(classes, args.sweep)
+        except ValueError as e:
+            print(f"⚠️ Sweep target: {e} (or 'tumor')")
+            return
+    scores, cls, normal = sweep_scores(probs, classes, args.sweep)
+    positives = labels == cls if cls is not None else labels != normal
+    sweep = threshold_sweep(scores, positives, np.round(np.arange(0.05, 1.0, 0.05), 2))
+    print(f"\nThreshold sweep ({args.sweep} vs rest):")
+    print(f"{'Threshold':>10}{'Sensitivity':>13}{'Specificity':>13}{'Precision':>11}")
+    for row in zip(*(sweep[k] for k in ["threshold", "sensitivity", "specificity", "precision"])):
+        print(f"{row[0]:>10.2f}{row[1]:>13.4f}{row[2]:>13.4f}{row[3]:>11.4f}")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    args.logits = args.logits or os.path.splitext(args.weights)[0] + "_logits.npz"
+    if args.analyze:
+        analyze(args)
+        exit()
+
+    # INT8 kernels are CPU-only; compare both models on the same device
+    device = torch.device("cpu") if args.int8 else DEVICE
+    timings = {"imports": IMPORT_S}
+    model = load_fp32_model(device, timings, args.weights)
+    start = time.perf_counter()
+    test_loader = build_test_loader()
+    timings["test_loader"] = time.perf_counter() - start
+    print_startup(timings)
+
+    print(f"🚀 Starting final evaluation on Test Set...")
+    prof = StageProfiler(args.profile, args.trace_dir, trace_active=args.profile_steps, name="eval")
+    fp32_results = evaluate(model, test_loader, device, prof)
+    prof.close()
+    prof.report("test set")
+    print_results(fp32_results)
+    test_dataset = test_loader.dataset
+    save_logits(args.logits, fp32_results["logits"], fp32_results["labels"], dataset_paths(test_dataset),
+                test_dataset.classes, args.weights)
+    print(f"💾 Logits saved: {args.logits} (re-analyse with --analyze)")
+
+    if args.tta:
+        print(f"🚀 Evaluating with TTA: {len(args.tta_views)} views ({', '.join(args.tta_views)}), rule={args.tta}")
+        tta_results = evaluate(TTABackend(model, args.tta, args.tta_views), test_loader, device)
+        print_comparison(fp32_results, tta_results, names=("Plain", "TTA"), title=f"Plain vs TTA ({args.tta})")
+        extra_ms = tta_results["latency_ms"] - fp32_results["latency_ms"]
+        gain = tta_results["recall"] - fp32_results["recall"]
+        print(f"TTA: recall {gain:+.4f} for {extra_ms:+.2f} ms/img "
+              f"({tta_results['latency_ms'] / max(fp32_results['latency_ms'], 1e-9):.1f}x latency)")
+
+    if args.int8:
+        from quantize import load_quantized
+        int8_path = export_paths(args.weights)["int8"]
+        try:
+            qmodel = load_quantized(int8_path)
+        except FileNotFoundError as e:
+            print(f"❌ Error: {e}")
+            exit(1)
+
+        print(f"🚀 Evaluating INT8 model: {int8_path}")
+        int8_results = evaluate(qmodel, test_loader, device)
+        print_comparison(fp32_results, int8_results,
+                         os.path.getsize(args.weights) / 1e6, os.path.getsize(int8_path) / 1e6)
+
+        # Recall gate: a cheaper model is not worth missed tumours
+        drop = fp32_results["recall"] - int8_results["recall"]
+        if drop > args.recall_tolerance:
+            print(f"❌ INT8 recall dropped by {drop:.4f} (tolerance {args.recall_tolerance:.4f}). Do not deploy.")
+            exit(1)
+        print(f"✅ INT8 recall within tolerance (drop {drop:+.4f} <= {args.recall_tolerance:.4f}).")
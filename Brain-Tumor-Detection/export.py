@@ -0,0 +1,101 @@
+import argparse
+import os
+
+import torch
+from torch.utils.data import DataLoader
+
+from backends import MODEL_PATH, OnnxBackend, TorchScriptBackend, export_paths, load_model
+from manifest import load_split
+from preprocess import IMG_SIZE
+
+CPU = torch.device("cpu")
+
+
+# --- EXPORTERS ---
+def export_torchscript(model, path):
+    example = torch.randn(1, 3, *IMG_SIZE)
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example)
+        # Freezing inlines the weights and folds BatchNorm for CPU serving
+        traced = torch.jit.freeze(traced)
+    traced.save(path)
+    print(f"💾 TorchScript saved: {path}")
+
+
+def export_onnx(model, path, opset=17):
+    example = torch.randn(1, 3, *IMG_SIZE)
+    torch.onnx.export(
+        model, example, path,
+        input_names=["input"],
+        output_names=["logits"],
+        dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=opset,
+    )
+    print(f"💾 ONNX saved: {path}")
+
+
+# --- PARITY CHECK ---
+def parity_check(model, backends, split="test", batch_size=16, atol=1e-3, use_cache=True):
+    # Run the eager model and every exported backend over the test split and
+    # compare logits and predicted classes image for image.
+    try:
+        dataset = load_split(split, use_cache)
+    except FileNotFoundError as e:
+        print(f"❌ Error: '{split}' split not found ({e})")
+        return False
+    # batch_size that does not divide the split also exercises the dynamic batch axis
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=False)
+
+    stats = {b.name: {"max_diff": 0.0, "mismatch": 0} for b in backends}
+    total = 0
+    with torch.no_grad():
+        for images, _ in loader:
+            reference = model(images)
+            ref_pred = reference.argmax(dim=1)
+            for backend in backends:
+                out = backend(images).float().cpu()
+                stats[backend.name]["max_diff"] = max(stats[backend.name]["max_diff"], (out - reference).abs().max().item())
+                stats[backend.name]["mismatch"] += (out.argmax(dim=1) != ref_pred).sum().item()
+            total += images.size(0)
+
+    ok = True
+    print("\n" + "=" * 30)
+    print(f"PARITY vs EAGER ({total} test images)")
+    print("=" * 30)
+    for name, s in stats.items():
+        passed = s["max_diff"] <= atol and s["mismatch"] == 0
+        ok = ok and passed
+        print(f"{'✅' if passed else '❌'} {name:<12} max|Δlogit| = {s['max_diff']:.2e}   label mismatches = {s['mismatch']}")
+    print("=" * 30)
+    return ok
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Export BrainTumorModel to TorchScript and ONNX.")
+    parser.add_argument("--weights", default=MODEL_PATH)
+    parser.add_argument("--formats", nargs="+", choices=["torchscript", "onnx"], default=["torchscript", "onnx"])
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--atol", type=float, default=1e-3, help="Max allowed absolute logit difference")
+    parser.add_argument("--split", default="test", help="Split used for the parity check")
+    parser.add_argument("--skip-parity", action="store_true")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Serving nodes are CPU-only, so export and verify on CPU
+    model = load_model(args.weights, CPU)
+    paths = export_paths(args.weights)
+
+    backends = []
+    if "torchscript" in args.formats:
+        export_torchscript(model, paths["torchscript"])
+        backends.append(TorchScriptBackend(paths["torchscript"], CPU))
+    if "onnx" in args.formats:
+        export_onnx(model, paths["onnx"], args.opset)
+        backends.append(OnnxBackend(paths["onnx"]))
+
+    if not args.skip_parity and not parity_check(model, backends, args.split, atol=args.atol):
+        print("❌ Exported model does not match the eager model. Do not deploy these files.")
+        raise SystemExit(1)
+    print("🎉 Export complete.")
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+from tqdm import tqdm
+
+from manifest import load_split
+from preprocess import IMG_SIZE, MEAN, STD
+from tensor_cache import CACHE_VERSION, fingerprint
+
+# --- PATHS ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_ROOT = os.path.abspath(os.path.join(BASE_DIR, "..", "data"))
+FEATURE_ROOT = os.path.join(DATA_ROOT, "feature_cache")
+
+FEATURE_DIM = 1280  # EfficientNet-B0 pooled output
+
+
+# --- CACHE KEY ---
+def backbone_hash(model):
+    h = hashlib.sha1()
+    for name, tensor in model.base_model.state_dict().items():
+        h.update(name.encode())
+        h.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return h.hexdigest()
+
+
+def feature_key(model, samples, classes):
+    # Invalidated by new backbone weights, a different preprocessing recipe,
+    # or any added/removed/rewritten image in the split.
+    h = hashlib.sha1()
+    h.update(backbone_hash(model).encode())
+    h.update(json.dumps({"size": list(IMG_SIZE), "mean": MEAN, "std": STD, "tensor_cache": CACHE_VERSION}).encode())
+    h.update(fingerprint(samples, classes).encode())
+    return h.hexdigest()
+
+
+def _read_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# --- EXTRACTION ---
+def extract_features(model, dataset, cache_dir, device, batch_size=64, num_workers=0):
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = os.path.join(cache_dir, "features.npy.tmp")
+    features = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float16, shape=(len(dataset), FEATURE_DIM))
+    labels = np.empty(len(dataset), dtype=np.int64)
+
+    model.eval()
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=False, num_workers=num_workers)
+    offset = 0
+    with torch.no_grad():
+        for images, targets in tqdm(loader, desc=f"Extracting {os.path.basename(cache_dir)} features"):
+            feats = model.base_model(images.to(device)).float().cpu().numpy()
+            features[offset:offset + len(feats)] = feats.astype(np.float16)
+            labels[offset:offset + len(feats)] = targets.numpy()
+            offset += len(feats)
+    features.flush()
+    del features
+
+    os.replace(tmp, os.path.join(cache_dir, "features.npy"))
+    np.save(os.path.join(cache_dir, "labels.npy"), labels)
+
+
+def load_features(model, split, device, feature_root=FEATURE_ROOT):
+    # Returns (features float16 array, labels), extracting only when the key changed
+    dataset = load_split(split)
+    if hasattr(dataset, "paths"):
+        samples = list(zip(dataset.paths, dataset.targets.tolist()))
+    else:
+        samples = dataset.samples
+    key = feature_key(model, samples, dataset.classes)
+    cache_dir = os.path.join(feature_root, split)
+
+    meta = _read_meta(cache_dir)
+    if meta is None or meta.get("key") != key:
+        print(f"🔄 Backbone features for '{split}' are stale or missing. Extracting once...")
+        extract_features(model, dataset, cache_dir, device)
+        with open(os.path.join(cache_dir, "meta.json"), "w") as f:
+            json.dump({"key": key, "count": len(samples), "dim": FEATURE_DIM}, f)
+
+    features = np.load(os.path.join(cache_dir, "features.npy"), mmap_mode="r")
+    labels = np.load(os.path.join(cache_dir, "labels.npy"))
+    return features, labels
@@ -0,0 +1,176 @@
+import os
+
+import numpy as np
+
+# --- LOGIT STORE ---
+# One row per test image: raw logits, label and file path, stored column-wise
+# in a single .npz. Everything below works from this file alone, so a new
+# metric question never needs another inference pass.
+
+def dataset_paths(dataset):
+    # File path per sample, in loader order (shuffle=False)
+    if hasattr(dataset, "paths"):
+        return list(dataset.paths)
+    return [path for path, _ in dataset.samples]
+
+
+def save_logits(path, logits, labels, paths, classes, model_path=None):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp.npz"
+    np.savez_compressed(
+        tmp,
+        logits=np.asarray(logits, dtype=np.float32),
+        labels=np.asarray(labels, dtype=np.int64),
+        paths=np.asarray(paths, dtype=str),
+        classes=np.asarray(classes, dtype=str),
+        model=np.asarray(model_path or ""),
+    )
+    os.replace(tmp, path)
+
+
+def load_logits(path):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Logit store not found at {path}. Run eval_test.py once without --analyze.")
+    with np.load(path) as data:
+        return {
+            "logits": data["logits"],
+            "labels": data["labels"],
+            "paths": data["paths"].tolist(),
+            "classes": data["classes"].tolist(),
+            "model": str(data["model"]),
+        }
+
+
+def softmax(logits):
+    z = logits - logits.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+# --- CONFUSION-MATRIX METRICS (vectorised, any leading batch shape) ---
+def confusion_matrix(labels, preds, num_classes):
+    # labels/preds (..., N) -> (..., C, C), rows = true class, cols = predicted
+    flat = labels * num_classes + preds
+    lead = flat.shape[:-1]
+    if lead:
+        # Offset each leading row into its own block so one bincount does them all
+        rows = int(np.prod(lead))
+        offsets = (np.arange(rows) * num_classes * num_classes)[:, None]
+        flat = flat.reshape(rows, -1) + offsets
+    counts = np.bincount(flat.ravel(), minlength=int(np.prod(lead or (1,))) * num_classes * num_classes)
+    return counts.reshape(*lead, num_classes, num_classes)
+
+
+def _ratio(num, den):
+    return np.divide(num, den, out=np.zeros(np.broadcast(num, den).shape), where=den > 0)
+
+
+def per_class_stats(cm):
+    # One-vs-rest counts per class: (..., C) each
+    cm = cm.astype(np.float64)
+    tp = np.diagonal(cm, axis1=-2, axis2=-1)
+    support = cm.sum(axis=-1)
+    predicted = cm.sum(axis=-2)
+    total = cm.sum(axis=(-2, -1))[..., None]
+    fn = support - tp
+    fp = predicted - tp
+    tn = total - tp - fn - fp
+    return {"tp": tp, "fp": fp, "fn": fn, "tn": tn, "support": support}
+
+
+def metrics_from_confusion(cm):
+    # Macro averages over classes, matching torchmetrics' Multiclass* (average='macro')
+    s = per_class_stats(cm)
+    recall = _ratio(s["tp"], s["tp"] + s["fn"])
+    precision = _ratio(s["tp"], s["tp"] + s["fp"])
+    f1 = _ratio(2 * precision * recall, precision + recall)
+    specificity = _ratio(s["tn"], s["tn"] + s["fp"])
+    return {
+        "accuracy": recall.mean(axis=-1),  # torchmetrics MulticlassAccuracy default is macro
+        "micro_accuracy": s["tp"].sum(axis=-1) / cm.sum(axis=(-2, -1)),
+        "precision": precision.mean(axis=-1),
+        "recall": recall.mean(axis=-1),
+        "f1": f1.mean(axis=-1),
+        "specificity": specificity.mean(axis=-1),
+        "per_class_recall": recall,
+        "per_class_precision": precision,
+    }
+
+
+# --- BOOTSTRAP ---
+def bootstrap(labels, preds, num_classes, n_boot=2000, ci=0.95, seed=0, chunk=500):
+    # Percentile CIs: resample indices for `chunk` replicates at a time and
+    # build all their confusion matrices in one bincount
+    rng = np.random.default_rng(seed)
+    n = len(labels)
+    samples = []
+    for start in range(0, n_boot, chunk):
+        idx = rng.integers(0, n, size=(min(chunk, n_boot - start), n))
+        cm = confusion_matrix(labels[idx], preds[idx], num_classes)
+        samples.append(metrics_from_confusion(cm))
+
+    alpha = (1 - ci) / 2
+    out = {}
+    for key in samples[0]:
+        values = np.concatenate([s[key] for s in samples], axis=0)
+        out[key] = (np.quantile(values, alpha, axis=0), np.quantile(values, 1 - alpha, axis=0))
+    return out
+
+
+# --- THRESHOLD SWEEP ---
+def threshold_sweep(scores, positives, thresholds):
+    # Binary decision `score >= t` for every threshold at once: (T, N) mask
+    positives = positives.astype(bool)
+    decided = scores[None, :] >= thresholds[:, None]
+    tp = (decided & positives).sum(axis=1)
+    fp = (decided & ~positives).sum(axis=1)
+    fn = positives.sum() - tp
+    tn = (~positives).sum() - fp
+    return {
+        "threshold": thresholds,
+        "sensitivity": _ratio(tp, tp + fn),
+        "specificity": _ratio(tn, tn + fp),
+        "precision": _ratio(tp, tp + fp),
+    }
+
+
+NORMAL_CLASS = "no_tumor"  # Folder name, as stored from ImageFolder.classes
+
+
+def class_index(classes, name):
+    # Stored classes are folder names (no_tumor); accept display names too (No Tumor)
+    wanted = name.strip().lower().replace(" ", "_")
+    for i, c in enumerate(classes):
+        if c.lower().replace(" ", "_") == wanted:
+            return i
+    raise ValueError(f"Unknown class '{name}'. Use one of: {', '.join(classes)}")
+
+
+def sweep_scores(probs, classes, target):
+    # "tumor": any tumour vs no_tumor (the screening question); otherwise one class vs rest
+    if target == "tumor":
+        normal = class_index(classes, NORMAL_CLASS)
+        return 1.0 - probs[:, normal], None, normal
+    cls = class_index(classes, target)
+    return probs[:, cls], cls, None
+
+
+# --- TORCHMETRICS ---
+def torchmetrics_metric(name, logits, labels, num_classes):
+    # Any torchmetrics.classification class by name, e.g. MulticlassAUROC
+    import torch
+    import torchmetrics.classification as tmc
+
+    metric_cls = getattr(tmc, name, None)
+    if not isinstance(metric_cls, type):
+        raise ValueError(f"Unknown torchmetrics metric '{name}'")
+    try:
+        metric = metric_cls(num_classes=num_classes, average="macro")
+    except TypeError:
+        try:
+            metric = metric_cls(num_classes=num_classes)
+        except TypeError as e:
+            # Binary/multilabel metrics take other arguments
+            raise ValueError(f"{name} cannot be built for {num_classes} classes: {e}") from e
+    metric.update(torch.from_numpy(logits), torch.from_numpy(labels))
+    return metric.compute()
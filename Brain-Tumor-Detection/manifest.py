@@ -0,0 +1,84 @@
+import csv
+import os
+
+from PIL import Image
+from torch.utils.data import Dataset
+from torchvision import datasets
+
+from preprocess import get_transform, load_uint8
+from tensor_cache import cached_image_folder, cached_samples
+
+# --- PATHS ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_ROOT = os.path.abspath(os.path.join(BASE_DIR, "..", "data"))
+MANIFEST_PATH = os.path.join(DATA_ROOT, "manifest.csv")
+
+MANIFEST_FIELDS = ["path", "class", "split"]
+
+
+def read_manifest(manifest_path=MANIFEST_PATH):
+    with open(manifest_path, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def write_manifest(rows, manifest_path=MANIFEST_PATH):
+    # Write-then-rename so readers never see a half-written manifest
+    tmp = manifest_path + ".tmp"
+    with open(tmp, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, manifest_path)
+
+
+def load_manifest(split, manifest_path=MANIFEST_PATH):
+    # Returns ImageFolder-style (samples, classes): classes sorted, paths absolute
+    rows = read_manifest(manifest_path)
+    classes = sorted({row["class"] for row in rows})
+    class_to_idx = {c: i for i, c in enumerate(classes)}
+    root = os.path.dirname(os.path.abspath(manifest_path))
+    samples = [
+        (os.path.join(root, *row["path"].split("/")), class_to_idx[row["class"]])
+        for row in rows if row["split"] == split
+    ]
+    return samples, classes
+
+
+class ManifestDataset(Dataset):
+    # ImageFolder equivalent for a manifest split. Decodes every access:
+    # PIL + transform by default, or straight to uint8 tensors with uint8=True.
+    def __init__(self, samples, classes, transform=None, uint8=False):
+        self.samples = samples
+        self.classes = classes
+        self.targets = [label for _, label in samples]
+        self.uint8 = uint8
+        self.transform = transform or get_transform()
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, idx):
+        path, label = self.samples[idx]
+        if self.uint8:
+            return load_uint8(path), label
+        img = Image.open(path).convert('RGB')
+        return self.transform(img), label
+
+
+def load_split(split, use_cache=True, transform=None, manifest_path=MANIFEST_PATH, uint8=False):
+    # Manifest when split_data.py has written one, else the legacy data/<split> folder.
+    # uint8=True yields resized uint8 images; run preprocess.normalize_batch() per batch.
+    if os.path.exists(manifest_path):
+        samples, classes = load_manifest(split, manifest_path)
+        if not samples:
+            raise FileNotFoundError(f"No '{split}' rows in {manifest_path}")
+        if use_cache:
+            return cached_samples(samples, classes, split, normalize=not uint8)
+        return ManifestDataset(samples, classes, transform, uint8=uint8)
+
+    split_dir = os.path.join(DATA_ROOT, split)
+    if use_cache:
+        return cached_image_folder(split_dir, normalize=not uint8)
+    if uint8:
+        return datasets.ImageFolder(split_dir, loader=load_uint8)
+    return datasets.ImageFolder(split_dir, transform=transform or get_transform())
@@ -0,0 +1,96 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+
+# --- DEFAULTS ---
+MAX_BATCH_SIZE = 16
+MAX_WAIT_MS = 10
+
+
+class MicroBatcher:
+    # In-process inference service. Callers from any thread submit single
+    # images; a worker thread groups whatever arrives within `max_wait_ms`
+    # (up to `max_batch_size`) into one forward pass and hands each caller
+    # back its own softmax row.
+    def __init__(self, predict_fn, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.images = 0
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, image):
+        # image: (3, H, W) or (1, 3, H, W) float tensor -> Future of a (num_classes,) tensor
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        if image.dim() == 4:
+            image = image.squeeze(0)
+        future = Future()
+        self.requests.put((image.cpu(), future))
+        return future
+
+    def predict(self, image, timeout=None):
+        return self.submit(image).result(timeout=timeout)
+
+    @property
+    def avg_batch_size(self):
+        return self.images / self.batches if self.batches else 0.0
+
+    def close(self):
+        self._closed = True
+        self.requests.put(None)
+        self._worker.join()
+
+    # --- WORKER ---
+    def _collect(self):
+        first = self.requests.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Finish this batch, then let the loop see the shutdown
+                self.requests.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            # Skip callers that cancelled while waiting
+            live = [(img, f) for img, f in batch if f.set_running_or_notify_cancel()]
+            if not live:
+                continue
+            images, futures = zip(*live)
+            try:
+                with torch.no_grad():
+                    logits = self.predict_fn(torch.stack(images))
+                    probs = torch.softmax(logits.float(), dim=1).cpu()
+            except Exception as e:
+                for f in futures:
+                    f.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.images += len(images)
+            for f, row in zip(futures, probs):
+                f.set_result(row)
@@ -1,23 +1,41 @@
+import time
+
 import torch
 import torch.nn as nn
-from torchvision import models
+
+# torchvision builder + weights enum per backbone. EfficientNet-B0 is the
+# production model; MobileNetV3-Small is the distilled CPU student (distill.py).
+BACKBONES = {
+    "efficientnet_b0": ("efficientnet_b0", "EfficientNet_B0_Weights"),
+    "mobilenet_v3_small": ("mobilenet_v3_small", "MobileNet_V3_Small_Weights"),
+}
+# Pooled feature size -> backbone, to tell checkpoints apart by their shapes
+FEATURE_DIMS = {1280: "efficientnet_b0", 576: "mobilenet_v3_small"}
 
 class BrainTumorModel(nn.Module):
-    def __init__(self, num_classes=4):
+    def __init__(self, num_classes=4, pretrained=True, backbone="efficientnet_b0", dropout=0.4, se_reduction=16):
         super(BrainTumorModel, self).__init__()
+        # Imported here: torchvision.models is one of the slowest imports on the startup path
+        from torchvision import models
         
         # Load Pretrained EfficientNet-B0 (Modern alternative to ResNet)
-        self.base_model = models.efficientnet_b0(weights=models.EfficientNet_B0_Weights.DEFAULT)
+        # pretrained=False gives random init (benchmarks, or weights loaded right after)
+        builder, weights_enum = BACKBONES[backbone]
+        weights = getattr(models, weights_enum).DEFAULT if pretrained else None
+        self.base_model = getattr(models, builder)(weights=weights)
+        self.backbone = backbone
         
-        # Extract features (EfficientNet-B0 outputs 1280 features)
-        in_features = self.base_model.classifier[1].in_features
+        # Extract features (EfficientNet-B0 outputs 1280, MobileNetV3-Small 576):
+        # the first Linear of the torchvision classifier sees the pooled features
+        in_features = next(m for m in self.base_model.classifier if isinstance(m, nn.Linear)).in_features
         self.base_model.classifier = nn.Identity()
 
         # Channel Attention Mechanism (Squeeze-and-Excitation)
+        hidden = in_features // se_reduction
         self.attention = nn.Sequential(
-            nn.Linear(in_features, in_features // 16),
+            nn.Linear(in_features, hidden),
             nn.ReLU(),
-            nn.Linear(in_features // 16, in_features),
+            nn.Linear(hidden, in_features),
             nn.Sigmoid()
         )
 
@@ -25,16 +43,75 @@ class BrainTumorModel(nn.Module):
         self.classifier = nn.Sequential(
             nn.Linear(in_features, 512),
             nn.ReLU(),
-            nn.Dropout(0.4),
+            nn.Dropout(dropout),
             nn.Linear(512, num_classes)
         )
 
     def forward(self, x):
         # x shape: (Batch, 3, 224, 224)
         features = self.base_model(x)
-        
+        return self.forward_head(features)
+
+    def forward_head(self, features):
+        # features shape: (Batch, in_features) pooled backbone output
         # Apply Attention Weights
         att_weights = self.attention(features)
         focused_features = features * att_weights
         
-        return self.classifier(focused_features)
\ No newline at end of file
+        return self.classifier(focused_features)
+
+
+# --- FAST LOADING (inference) ---
+def load_weights(path, device="cpu"):
+    # mmap: tensors are paged in from the file on first touch instead of being
+    # read and copied up front; weights_only refuses pickled code in the file.
+    try:
+        return torch.load(path, map_location=device, mmap=True, weights_only=True)
+    except TypeError:
+        # torch < 2.1 has no mmap argument
+        return torch.load(path, map_location=device)
+    except RuntimeError:
+        # Legacy (non-zipfile) checkpoints cannot be memory-mapped
+        return torch.load(path, map_location=device, weights_only=True)
+
+
+def infer_config(state):
+    # Teacher and student checkpoints share key names; the SE block's shape gives
+    # away both the backbone (input width) and the reduction ratio (sweeps)
+    hidden, in_features = state["attention.0.weight"].shape
+    return {"backbone": FEATURE_DIMS[in_features], "se_reduction": in_features // hidden}
+
+
+def load_inference_model(weights_path, device="cpu", num_classes=4, timings=None):
+    # Never touches the ImageNet weights (no download, works offline). The
+    # skeleton is built on the meta device -- no allocation, no random init --
+    # and the checkpoint tensors are assigned straight into it.
+    timings = {} if timings is None else timings
+
+    start = time.perf_counter()
+    state = load_weights(weights_path, device)
+    timings["load_weights"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    config = infer_config(state)
+    try:
+        with torch.device("meta"):
+            model = BrainTumorModel(num_classes=num_classes, pretrained=False, **config)
+        on_meta = True
+    except (AttributeError, TypeError):
+        # torch < 2.0: torch.device is not a context manager
+        model = BrainTumorModel(num_classes=num_classes, pretrained=False, **config)
+        on_meta = False
+    if on_meta:
+        try:
+            model.load_state_dict(state, assign=True)
+        except TypeError:
+            # torch < 2.1 has no assign: materialise empty tensors, then copy
+            model.to_empty(device=device)
+            model.load_state_dict(state)
+    else:
+        model.load_state_dict(state)
+    model.to(device)
+    model.eval()
+    timings["construct"] = time.perf_counter() - start
+    return model
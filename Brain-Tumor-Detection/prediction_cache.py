@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+
+import torch
+
+# --- DEFAULTS ---
+MAX_ENTRIES = 512
+MAX_DISK_MB = 64
+# Namespace folders this class creates: weights_hash values. Nothing else in
+# disk_dir is ever deleted, so pointing it at a shared folder is safe.
+NAMESPACE_RE = re.compile(r"^(?:[0-9a-f]{16}|no-weights)$")
+
+
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class PredictionCache:
+    # Softmax rows keyed by sha256(image bytes) + backend, namespaced by the
+    # hash of the weights file. Replacing the weights changes the namespace,
+    # which drops the memory tier and deletes the stale disk tier.
+    # Pass `weights_hash` (of the weights the serving model was loaded from) to
+    # pin the namespace: the file is then never re-read, so a .pth swapped under
+    # a running model cannot file the old model's outputs under the new hash.
+    def __init__(self, weights_path, max_entries=MAX_ENTRIES, disk_dir=None, max_disk_mb=MAX_DISK_MB,
+                 weights_hash=None):
+        self.weights_path = weights_path
+        self.pinned_hash = weights_hash
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = int(max_disk_mb * 1e6)
+
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._weights_stat = None
+        self.weights_hash = None
+        self._disk_bytes = 0
+        if weights_hash is not None:
+            self._set_namespace(weights_hash)
+        self._check_weights()
+
+    # --- INVALIDATION ---
+    def _check_weights(self):
+        # Re-hash only when size/mtime change; a stat per lookup is cheap
+        if self.pinned_hash is not None:
+            return
+        try:
+            st = os.stat(self.weights_path)
+            stat = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            stat = None
+        if stat == self._weights_stat:
+            return
+
+        self._weights_stat = stat
+        self._set_namespace(file_digest(self.weights_path)[:16] if stat else "no-weights")
+
+    def _set_namespace(self, weights_hash):
+        self.weights_hash = weights_hash
+        self.memory.clear()
+        if self.disk_dir:
+            self._reset_disk()
+
+    def _namespace_dir(self):
+        return os.path.join(self.disk_dir, self.weights_hash)
+
+    def _reset_disk(self):
+        os.makedirs(self._namespace_dir(), exist_ok=True)
+        for entry in os.scandir(self.disk_dir):
+            if entry.name != self.weights_hash and entry.is_dir() and NAMESPACE_RE.match(entry.name):
+                shutil.rmtree(entry.path, ignore_errors=True)
+        self._disk_bytes = sum(e.stat().st_size for e in os.scandir(self._namespace_dir()))
+
+    # --- LOOKUP ---
+    def key(self, image_bytes, variant=""):
+        return hashlib.sha256(image_bytes).hexdigest() + (f"-{variant}" if variant else "")
+
+    def get(self, image_bytes, variant=""):
+        key = self.key(image_bytes, variant)
+        with self.lock:
+            self._check_weights()
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return self.memory[key].clone()
+
+            probs = self._disk_get(key)
+            if probs is not None:
+                self.disk_hits += 1
+                self._memory_put(key, probs)
+                return probs.clone()
+
+            self.misses += 1
+            return None
+
+    def put(self, image_bytes, probs, variant=""):
+        key = self.key(image_bytes, variant)
+        probs = probs.detach().float().cpu()
+        with self.lock:
+            self._check_weights()
+            self._memory_put(key, probs)
+            self._disk_put(key, probs)
+
+    def _memory_put(self, key, probs):
+        self.memory[key] = probs
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    # --- DISK TIER ---
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = os.path.join(self._namespace_dir(), key + ".json")
+        try:
+            with open(path) as f:
+                probs = torch.tensor(json.load(f))
+        except (OSError, ValueError):
+            return None
+        # Touch on hit so eviction drops the least recently used files first
+        os.utime(path)
+        return probs
+
+    def _disk_put(self, key, probs):
+        if not self.disk_dir:
+            return
+        # Recreated if the folder was removed underneath us
+        os.makedirs(self._namespace_dir(), exist_ok=True)
+        path = os.path.join(self._namespace_dir(), key + ".json")
+        if os.path.exists(path):
+            return
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(probs.tolist(), f)
+        os.replace(tmp, path)
+        self._disk_bytes += os.path.getsize(path)
+        if self._disk_bytes > self.max_disk_bytes:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        # Size-based eviction, oldest access first, down to 90% of the budget
+        entries = sorted(os.scandir(self._namespace_dir()), key=lambda e: e.stat().st_mtime)
+        target = int(self.max_disk_bytes * 0.9)
+        for entry in entries:
+            if self._disk_bytes <= target:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+                self._disk_bytes -= size
+            except OSError:
+                pass
+
+    # --- STATS ---
+    def stats(self):
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+            "entries": len(self.memory),
+        }
@@ -0,0 +1,71 @@
+import torch
+import torch.nn.functional as F
+
+# --- SHARED PREPROCESSING ---
+# Same numbers as the training transform, kept in one place so the
+# batch scorer and the training/eval scripts cannot drift apart.
+IMG_SIZE = (224, 224)
+MEAN = [0.485, 0.456, 0.406]
+STD = [0.229, 0.224, 0.225]
+
+# Alphabetical order as per ImageFolder
+CLASS_NAMES = ['Glioma', 'Meningioma', 'No Tumor', 'Pituitary']
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+_MEAN = torch.tensor(MEAN).view(1, 3, 1, 1)
+_STD = torch.tensor(STD).view(1, 3, 1, 1)
+
+
+def get_transform():
+    # PIL path, kept for callers that still hand over PIL images
+    from torchvision import transforms
+    return transforms.Compose([
+        transforms.Resize(IMG_SIZE),
+        transforms.ToTensor(),
+        transforms.Normalize(MEAN, STD)
+    ])
+
+
+# --- TENSOR PATH ---
+# Workers decode + resize to uint8 (4x smaller to move around than float32);
+# the float conversion and normalisation then run once per batch.
+def decode_image(source):
+    # File path or raw bytes -> uint8 (3, H, W) RGB tensor, no PIL involved.
+    # torchvision is imported on first use so importing this module stays cheap.
+    from torchvision.io import ImageReadMode, decode_image as _decode_image, read_file
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = torch.frombuffer(bytearray(source), dtype=torch.uint8)
+    else:
+        data = read_file(source)
+    return _decode_image(data, mode=ImageReadMode.RGB)
+
+
+def resize_uint8(images, size=IMG_SIZE):
+    # uint8 (3, H, W) or (B, 3, H, W) -> uint8 at `size`. Antialiased bilinear
+    # matches the PIL Resize used at training time to within rounding.
+    single = images.dim() == 3
+    batch = images.unsqueeze(0) if single else images
+    if tuple(batch.shape[-2:]) != tuple(size):
+        batch = F.interpolate(batch.float(), size=size, mode="bilinear", antialias=True, align_corners=False)
+        batch = batch.round_().clamp_(0, 255).to(torch.uint8)
+    return batch[0] if single else batch
+
+
+def load_uint8(source, size=IMG_SIZE):
+    return resize_uint8(decode_image(source), size)
+
+
+def normalize_batch(batch, device=None, memory_format=torch.contiguous_format):
+    # uint8 (B, 3, H, W) -> normalised float. Copy to the device while still
+    # uint8, then convert there in one vectorised pass.
+    if device is not None:
+        batch = batch.to(device, non_blocking=True)
+    batch = batch.float().div_(255)
+    mean, std = _MEAN.to(batch.device), _STD.to(batch.device)
+    return batch.sub_(mean).div_(std).contiguous(memory_format=memory_format)
+
+
+def preprocess_batch(batch, device=None, size=IMG_SIZE):
+    # Same-sized uint8 batch (e.g. video frames, synthetic benchmarks) -> model input
+    return normalize_batch(resize_uint8(batch, size), device)
@@ -0,0 +1,133 @@
+import contextlib
+import os
+import threading
+import time
+from collections import defaultdict
+
+import torch
+
+# Stage names used across train / eval / serve so the reports line up
+STAGES = ["data_wait", "decode_transform", "host_to_device", "forward", "backward", "optimizer_step", "metric_update"]
+
+# Shared no-op context: a disabled profiler costs one attribute check per stage
+_NULL = contextlib.nullcontext()
+
+
+class _Stage:
+    __slots__ = ("prof", "name", "start", "marker")
+
+    def __init__(self, prof, name):
+        self.prof = prof
+        self.name = name
+
+    def __enter__(self):
+        self.prof._sync()
+        self.marker = torch.profiler.record_function(self.name)
+        self.marker.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.prof._sync()
+        self.prof.totals[self.name] += time.perf_counter() - self.start
+        self.prof.counts[self.name] += 1
+        self.marker.__exit__(*exc)
+        return False
+
+
+class StageProfiler:
+    # Wall-clock time per pipeline stage, plus an optional torch.profiler
+    # Chrome trace over a window of steps (skip `trace_wait`, warm up for
+    # `trace_warmup`, record `trace_active`). Disabled -> every call is a no-op.
+    # The trace side (step / close) is thread-safe and stops itself once the
+    # window is saved; stage totals are not, use one profiler per thread.
+    def __init__(self, enabled=False, trace_dir=None, trace_wait=1, trace_warmup=1, trace_active=5, name="run"):
+        self.enabled = enabled
+        self.name = name
+        self.trace_dir = trace_dir
+        self.totals = defaultdict(float)
+        self.counts = defaultdict(int)
+        self._cuda = torch.cuda.is_available()
+        self._torch_prof = None
+        self._trace_lock = threading.Lock()
+        self._trace_steps = trace_wait + trace_warmup + trace_active
+        self._steps = 0
+
+        if enabled and trace_dir and trace_active > 0:
+            os.makedirs(trace_dir, exist_ok=True)
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if self._cuda:
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            self._torch_prof = torch.profiler.profile(
+                activities=activities,
+                schedule=torch.profiler.schedule(wait=trace_wait, warmup=trace_warmup, active=trace_active, repeat=1),
+                on_trace_ready=self._save_trace,
+            )
+            self._torch_prof.start()
+
+    def _sync(self):
+        # Without a sync, async CUDA kernels would be billed to the next stage
+        if self._cuda:
+            torch.cuda.synchronize()
+
+    def _save_trace(self, prof):
+        path = os.path.join(self.trace_dir, f"{self.name}_{time.strftime('%Y%m%d-%H%M%S')}.json")
+        prof.export_chrome_trace(path)
+        print(f"🧭 Chrome trace saved: {path} (open in chrome://tracing or ui.perfetto.dev)")
+
+    # --- INSTRUMENTATION ---
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL
+        return _Stage(self, name)
+
+    def iter(self, iterable, name="data_wait"):
+        # Times how long the loop waits for each batch from the DataLoader
+        if not self.enabled:
+            return iterable
+        return self._timed_iter(iterable, name)
+
+    def _timed_iter(self, iterable, name):
+        it = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+            yield item
+
+    def step(self):
+        if self._torch_prof is None:
+            return
+        with self._trace_lock:
+            if self._torch_prof is None:
+                return
+            self._torch_prof.step()
+            self._steps += 1
+            if self._steps >= self._trace_steps:
+                # Trace window saved: stop paying the profiler overhead
+                self._stop_trace()
+
+    # --- REPORTING ---
+    def report(self, title):
+        # Print the per-stage breakdown and start a fresh window
+        if not self.enabled or not self.totals:
+            return
+        total = sum(self.totals.values())
+        print(f"\n⏱️ Stage breakdown ({title}):")
+        names = [s for s in STAGES if s in self.totals] + [s for s in self.totals if s not in STAGES]
+        for name in names:
+            t, n = self.totals[name], self.counts[name]
+            print(f"   {name:<18}{t:>9.3f} s {100 * t / total:>6.1f}%  {1000 * t / n:>9.2f} ms/call  x{n}")
+        self.totals.clear()
+        self.counts.clear()
+
+    def _stop_trace(self):
+        if self._torch_prof is not None:
+            self._torch_prof.stop()
+            self._torch_prof = None
+
+    def close(self):
+        with self._trace_lock:
+            self._stop_trace()
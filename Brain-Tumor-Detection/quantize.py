@@ -0,0 +1,88 @@
+import argparse
+import copy
+import os
+
+import torch
+import torch.nn as nn
+from torch.ao.quantization import get_default_qconfig_mapping, quantize_dynamic
+from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+from torch.utils.data import DataLoader
+
+from backends import MODEL_PATH, export_paths, load_model
+from manifest import load_split
+from preprocess import IMG_SIZE
+
+CPU = torch.device("cpu")
+
+# x86 kernels when available (torch >= 2.0), fbgemm otherwise
+ENGINE = "x86" if "x86" in torch.backends.quantized.supported_engines else "fbgemm"
+CALIB_SEED = 0  # Same calibration images every run -> reproducible INT8 scales
+
+
+def calibration_loader(split="val", batch_size=16, use_cache=True, seed=CALIB_SEED):
+    dataset = load_split(split, use_cache)
+    # Shuffled so the first batches mix all classes, but with a seeded generator
+    generator = torch.Generator().manual_seed(seed)
+    return DataLoader(dataset, batch_size=batch_size, shuffle=True, generator=generator)
+
+
+# --- QUANTIZATION ---
+def quantize_model(model, calib_loader, num_batches=32):
+    # Static INT8 for the EfficientNet backbone (activation ranges observed on
+    # the val split), dynamic INT8 for the SE-attention and classifier Linears.
+    torch.backends.quantized.engine = ENGINE
+    qmodel = copy.deepcopy(model).to(CPU).eval()
+
+    example = (torch.randn(1, 3, *IMG_SIZE),)
+    prepared = prepare_fx(qmodel.base_model, get_default_qconfig_mapping(ENGINE), example)
+    with torch.no_grad():
+        for i, (images, _) in enumerate(calib_loader):
+            if i >= num_batches:
+                break
+            prepared(images)
+    qmodel.base_model = convert_fx(prepared)
+
+    qmodel.attention = quantize_dynamic(qmodel.attention, {nn.Linear}, dtype=torch.qint8)
+    qmodel.classifier = quantize_dynamic(qmodel.classifier, {nn.Linear}, dtype=torch.qint8)
+    return qmodel
+
+
+def save_quantized(qmodel, path):
+    # Quantized graphs are not plain state_dicts; ship them as TorchScript
+    example = torch.randn(1, 3, *IMG_SIZE)
+    with torch.no_grad():
+        scripted = torch.jit.freeze(torch.jit.trace(qmodel, example))
+    scripted.save(path)
+    return path
+
+
+def load_quantized(path):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"INT8 model not found at {path}. Run quantize.py first.")
+    torch.backends.quantized.engine = ENGINE
+    qmodel = torch.jit.load(path, map_location=CPU)
+    qmodel.eval()
+    return qmodel
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="INT8 post-training quantization of BrainTumorModel.")
+    parser.add_argument("--weights", default=MODEL_PATH)
+    parser.add_argument("--split", default="val", help="Split used for calibration")
+    parser.add_argument("--calib-batches", type=int, default=32, help="Val batches used to calibrate activations")
+    parser.add_argument("--seed", type=int, default=CALIB_SEED, help="Seed for the calibration batch order")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    model = load_model(args.weights, CPU)
+    print(f"🔧 Calibrating on the {args.split} split ({args.calib_batches} batches, engine={ENGINE})...")
+    qmodel = quantize_model(model, calibration_loader(args.split, seed=args.seed), args.calib_batches)
+
+    out_path = save_quantized(qmodel, export_paths(args.weights)["int8"])
+    fp32_mb = os.path.getsize(args.weights) / 1e6
+    int8_mb = os.path.getsize(out_path) / 1e6
+    print(f"💾 INT8 model saved: {out_path}")
+    print(f"   Size: {fp32_mb:.1f} MB (fp32) -> {int8_mb:.1f} MB (int8)")
+    print("👉 Run eval_test.py --int8 to check accuracy and recall before deploying.")
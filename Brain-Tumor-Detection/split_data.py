@@ -1,51 +1,102 @@
 import os
-import random
-import shutil
-from tqdm import tqdm
+import argparse
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from manifest import MANIFEST_PATH, write_manifest
+from preprocess import IMAGE_EXTENSIONS
 
 # --- DYNAMIC PATH FIX ---
 # Yeh line script ki location ke hisaab se automatic "data" folder dhoond legi
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 # Agar script "models" folder mein hai, toh ek level upar jaa kar "data" dhoondega
-DATA_DIR = os.path.join(BASE_DIR, "..", "data") 
+DATA_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "data"))
 
 CATEGORIES = ["glioma", "meningioma", "pituitary", "no_tumor"]
+# Folders scanned for images. val/test are included so data moved there by the
+# old shutil-based split is still picked up (and re-assigned by hash).
+SOURCE_FOLDERS = ["train", "val", "test"]
+SCAN_WORKERS = 16  # Directory listing is I/O bound, threads are enough
+SEED = "brain-tumor-v1"
 
-def split_dataset(val_ratio=0.15, test_ratio=0.15):
-    for cat in CATEGORIES:
-        # Full paths with os.path.join for Windows compatibility
-        train_path = os.path.abspath(os.path.join(DATA_DIR, "train", cat))
-        val_path = os.path.abspath(os.path.join(DATA_DIR, "val", cat))
-        test_path = os.path.abspath(os.path.join(DATA_DIR, "test", cat))
-
-        print(f"Checking path: {train_path}") # Debugging ke liye
 
-        if not os.path.exists(train_path):
-            print(f"❌ Error: Folder nahi mila -> {train_path}")
+# --- PARALLEL SCAN ---
+def _scan_dir(folder, cat):
+    # Recursive os.scandir of one class folder: [(relative posix path, class)]
+    root = os.path.join(DATA_DIR, folder, cat)
+    found, stack = [], [root]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except FileNotFoundError:
             continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                rel = os.path.relpath(entry.path, DATA_DIR).replace(os.sep, "/")
+                found.append((rel, cat))
+    return found
+
+
+def scan_images(workers=SCAN_WORKERS):
+    jobs = [(folder, cat) for folder in SOURCE_FOLDERS for cat in CATEGORIES]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda job: _scan_dir(*job), jobs)
+    return [item for chunk in results for item in chunk]
 
-        os.makedirs(val_path, exist_ok=True)
-        os.makedirs(test_path, exist_ok=True)
 
-        images = os.listdir(train_path)
-        random.shuffle(images)
+# --- DETERMINISTIC SPLIT ---
+def assign_split(cat, filename, val_ratio, test_ratio, seed=SEED):
+    # Hash of (class, path inside the class folder) only, so the same image lands
+    # in the same split no matter which split folder it sits in or how often this
+    # runs. Flat class folders hash exactly the file name, as before.
+    digest = hashlib.sha1(f"{seed}/{cat}/{filename}".encode()).hexdigest()
+    u = int(digest[:8], 16) / 0x100000000
+    if u < test_ratio:
+        return "test"
+    if u < test_ratio + val_ratio:
+        return "val"
+    return "train"
 
-        val_count = int(len(images) * val_ratio)
-        test_count = int(len(images) * test_ratio)
 
-        # Move to Val
-        for _ in range(val_count):
-            if not images: break
-            img = images.pop()
-            shutil.move(os.path.join(train_path, img), os.path.join(val_path, img))
+def split_dataset(val_ratio=0.15, test_ratio=0.15, seed=SEED, workers=SCAN_WORKERS, manifest_path=MANIFEST_PATH):
+    images = scan_images(workers)
+    if not images:
+        print(f"❌ Error: No images found under {DATA_DIR}/{{{','.join(SOURCE_FOLDERS)}}}/<class>")
+        return None
 
-        # Move to Test
-        for _ in range(test_count):
-            if not images: break
-            img = images.pop()
-            shutil.move(os.path.join(train_path, img), os.path.join(test_path, img))
+    rows, seen, duplicates = [], set(), []
+    for rel, cat in sorted(images):
+        # "<split>/<class>/sub/x.jpg" -> "sub/x.jpg": identity inside the class folder,
+        # so same-named images in different subfolders are kept apart
+        class_rel = rel.split("/", 2)[-1]
+        if (cat, class_rel) in seen:
+            duplicates.append(rel)  # Same file left in two split folders: keep the first
+            continue
+        seen.add((cat, class_rel))
+        rows.append({"path": rel, "class": cat, "split": assign_split(cat, class_rel, val_ratio, test_ratio, seed)})
+
+    write_manifest(rows, manifest_path)
+
+    counts = {}
+    for row in rows:
+        counts[(row["class"], row["split"])] = counts.get((row["class"], row["split"]), 0) + 1
+    for cat in CATEGORIES:
+        print(f"{cat:<12} train={counts.get((cat, 'train'), 0):<6} val={counts.get((cat, 'val'), 0):<6} "
+              f"test={counts.get((cat, 'test'), 0)}")
+    if duplicates:
+        print(f"⚠️ Skipped {len(duplicates)} duplicates (same class + path in another split folder), e.g. "
+              + ", ".join(duplicates[:5]))
+    print(f"✅ Manifest written: {manifest_path} ({len(rows)} images, nothing moved)")
+    return manifest_path
 
-    print("✅ Data Split Complete!")
 
 if __name__ == "__main__":
-    split_dataset()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Write a deterministic train/val/test manifest.")
+    parser.add_argument("--val-ratio", type=float, default=0.15)
+    parser.add_argument("--test-ratio", type=float, default=0.15)
+    parser.add_argument("--seed", default=SEED, help="Change to draw a different (still reproducible) split")
+    parser.add_argument("--workers", type=int, default=SCAN_WORKERS)
+    args = parser.parse_args()
+    split_dataset(args.val_ratio, args.test_ratio, args.seed, args.workers)
@@ -0,0 +1,251 @@
+import argparse
+import json
+import math
+import multiprocessing as mp
+import os
+import random
+import sqlite3
+import statistics
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Heavy imports (torch, train.py) happen inside the trial processes so each one
+# sets its own thread count before torch spins up its pools.
+
+# --- PATHS ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_PATH = os.path.join(BASE_DIR, "sweeps.db")
+
+# --- SEARCH SPACE ---
+# ("log", lo, hi) log-uniform, ("uniform", lo, hi), or a list of choices
+SPACE = {
+    "lr": ("log", 1e-5, 1e-3),
+    "batch_size": [8, 16, 32],
+    "dropout": ("uniform", 0.1, 0.6),
+    "se_reduction": [4, 8, 16, 32],
+}
+TRIALS = 16
+EPOCHS = 8
+PARALLEL = max(1, (os.cpu_count() or 1) // 4)
+THREADS = 4
+# Pruning on validation macro-recall
+WARMUP_EPOCHS = 2   # median: never prune before this many epochs
+MIN_TRIALS = 3      # median: need this many other trials at the same epoch
+ASHA_MIN_EPOCHS = 1
+ASHA_ETA = 3
+
+
+def sample_config(rng, space=SPACE):
+    config = {}
+    for name, spec in space.items():
+        if isinstance(spec, list):
+            config[name] = rng.choice(spec)
+        elif spec[0] == "log":
+            config[name] = math.exp(rng.uniform(math.log(spec[1]), math.log(spec[2])))
+        else:
+            config[name] = rng.uniform(spec[1], spec[2])
+    return config
+
+
+# --- TRIAL STORE ---
+class TrialStore:
+    # One SQLite file shared by the driver and every trial process (WAL mode,
+    # short transactions). Also the pruners' view of how other trials are doing.
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS trials (
+                id INTEGER PRIMARY KEY, sweep TEXT, config TEXT, status TEXT,
+                best_recall REAL, best_epoch INTEGER, epochs_run INTEGER,
+                wall_s REAL, started REAL, finished REAL, error TEXT)""")
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS epochs (
+                trial_id INTEGER, epoch INTEGER, recall REAL, metrics TEXT, elapsed_s REAL,
+                PRIMARY KEY (trial_id, epoch))""")
+
+    def create_trial(self, sweep, config):
+        with self.conn:
+            cur = self.conn.execute("INSERT INTO trials (sweep, config, status) VALUES (?, ?, 'queued')",
+                                    (sweep, json.dumps(config)))
+        return cur.lastrowid
+
+    def start_trial(self, trial_id):
+        with self.conn:
+            self.conn.execute("UPDATE trials SET status='running', started=? WHERE id=?", (time.time(), trial_id))
+
+    def report_epoch(self, trial_id, epoch, results, elapsed_s):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO epochs VALUES (?, ?, ?, ?, ?)",
+                              (trial_id, epoch, results["recall"], json.dumps(results), elapsed_s))
+
+    def finish_trial(self, trial_id, status, summary=None, wall_s=None, error=None):
+        summary = summary or {}
+        with self.conn:
+            self.conn.execute(
+                "UPDATE trials SET status=?, best_recall=?, best_epoch=?, epochs_run=?, wall_s=?, finished=?, error=? "
+                "WHERE id=?",
+                (status, summary.get("best_recall"), summary.get("best_epoch"), summary.get("epochs_run"),
+                 wall_s, time.time(), error, trial_id))
+
+    def recalls_at(self, sweep, epoch, exclude=None):
+        rows = self.conn.execute(
+            "SELECT e.recall FROM epochs e JOIN trials t ON t.id = e.trial_id "
+            "WHERE t.sweep=? AND e.epoch=? AND e.trial_id != ?", (sweep, epoch, exclude or -1))
+        return [r[0] for r in rows]
+
+    def leaderboard(self, sweep, limit=10):
+        rows = self.conn.execute(
+            "SELECT id, status, best_recall, best_epoch, epochs_run, wall_s, config FROM trials "
+            "WHERE sweep=? ORDER BY best_recall IS NULL, best_recall DESC LIMIT ?", (sweep, limit))
+        return rows.fetchall()
+
+    def close(self):
+        self.conn.close()
+
+
+# --- PRUNERS ---
+class MedianPruner:
+    # Stop a trial whose recall is below the median of the other trials at the same epoch
+    def __init__(self, warmup_epochs=WARMUP_EPOCHS, min_trials=MIN_TRIALS):
+        self.warmup_epochs = warmup_epochs
+        self.min_trials = min_trials
+
+    def should_prune(self, store, sweep, trial_id, epoch, recall):
+        if epoch + 1 < self.warmup_epochs:
+            return False
+        others = store.recalls_at(sweep, epoch, exclude=trial_id)
+        return len(others) >= self.min_trials and recall < statistics.median(others)
+
+
+class ASHAPruner:
+    # Asynchronous successive halving: at rungs min_epochs * eta^k, a trial goes
+    # on only if it is in the top 1/eta of the trials that reached that rung so far
+    def __init__(self, min_epochs=ASHA_MIN_EPOCHS, eta=ASHA_ETA):
+        self.min_epochs = min_epochs
+        self.eta = eta
+
+    def _is_rung(self, epoch):
+        k = math.log(epoch / self.min_epochs, self.eta) if epoch >= self.min_epochs else -1
+        return k >= 0 and abs(k - round(k)) < 1e-9
+
+    def should_prune(self, store, sweep, trial_id, epoch, recall):
+        if not self._is_rung(epoch + 1):
+            return False
+        peers = store.recalls_at(sweep, epoch, exclude=trial_id) + [recall]
+        if len(peers) < self.eta:
+            return False
+        keep = len(peers) // self.eta
+        return recall < sorted(peers, reverse=True)[keep - 1]
+
+
+PRUNERS = {"median": MedianPruner, "asha": ASHAPruner, "none": None}
+
+
+# --- TRIAL (runs in a pool process) ---
+def run_trial(trial_id, sweep, config, store_path, pruner, epochs, threads):
+    import torch
+    torch.set_num_threads(threads)
+    import train as train_mod
+
+    store = TrialStore(store_path)
+    store.start_trial(trial_id)
+    start = time.perf_counter()
+    args = train_mod.parse_args([
+        "--epochs", str(epochs), "--batch-size", str(config["batch_size"]), "--lr", str(config["lr"]),
+        "--dropout", str(config["dropout"]), "--se-reduction", str(config["se_reduction"]),
+        "--workers", "0", "--no-save",
+    ])
+
+    def on_epoch(epoch, results):
+        store.report_epoch(trial_id, epoch, results, time.perf_counter() - start)
+        return not (pruner and pruner.should_prune(store, sweep, trial_id, epoch, results["recall"]))
+
+    try:
+        summary = train_mod.train(args, on_epoch=on_epoch)
+    except Exception:
+        store.finish_trial(trial_id, "failed", wall_s=time.perf_counter() - start, error=traceback.format_exc())
+        store.close()
+        raise
+    wall_s = time.perf_counter() - start
+    store.finish_trial(trial_id, "pruned" if summary["pruned"] else "complete", summary, wall_s)
+    store.close()
+    return trial_id, summary, wall_s
+
+
+def prepare_data():
+    # Build the tensor caches once up front, not concurrently in every trial
+    from manifest import load_split
+    load_split("train")
+    load_split("val")
+
+
+def run_sweep(args):
+    sweep = args.name or time.strftime("sweep-%Y%m%d-%H%M%S")
+    rng = random.Random(args.seed)
+    pruner = PRUNERS[args.pruner]() if PRUNERS[args.pruner] else None
+    store = TrialStore(args.store)
+    configs = [sample_config(rng) for _ in range(args.trials)]
+    trial_ids = [store.create_trial(sweep, c) for c in configs]
+
+    prepare_data()
+    print(f"🚀 Sweep '{sweep}': {args.trials} trials, {args.parallel} in parallel x {args.threads} threads, "
+          f"{args.epochs} epochs max, pruner={args.pruner}")
+    # spawn: a forked child would inherit the parent's torch/OpenMP state
+    ctx = mp.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.parallel, mp_context=ctx) as pool:
+        futures = {pool.submit(run_trial, tid, sweep, cfg, args.store, pruner, args.epochs, args.threads): tid
+                   for tid, cfg in zip(trial_ids, configs)}
+        for done, future in enumerate(as_completed(futures), 1):
+            tid = futures[future]
+            try:
+                _, summary, wall_s = future.result()
+            except Exception as e:
+                print(f"❌ [{done}/{len(futures)}] trial {tid} failed: {e}")
+                continue
+            status = "✂️ pruned" if summary["pruned"] else "✅ done"
+            print(f"{status} [{done}/{len(futures)}] trial {tid}: best recall {summary['best_recall']:.4f} "
+                  f"after {summary['epochs_run']} epochs ({wall_s:.0f} s)")
+
+    print_leaderboard(store, sweep)
+    store.close()
+
+
+def print_leaderboard(store, sweep, limit=10):
+    rows = store.leaderboard(sweep, limit)
+    print("\n" + "="*100)
+    print(f"SWEEP '{sweep}' — top {len(rows)} by validation macro-recall")
+    print("="*100)
+    print(f"{'Trial':>6}{'Status':>10}{'Recall':>9}{'Epochs':>8}{'Wall (s)':>10}   "
+          f"{'lr':>9}{'batch':>7}{'dropout':>9}{'SE r':>6}")
+    for tid, status, recall, best_epoch, epochs_run, wall_s, config in rows:
+        c = json.loads(config)
+        recall_s = f"{recall:.4f}" if recall is not None else "-"
+        print(f"{tid:>6}{status:>10}{recall_s:>9}{epochs_run or 0:>8}{wall_s or 0:>10.0f}   "
+              f"{c['lr']:>9.2e}{c['batch_size']:>7}{c['dropout']:>9.3f}{c['se_reduction']:>6}")
+    print("="*100)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep for BrainTumorModel with trial pruning.")
+    parser.add_argument("--name", help="Sweep name in the store (default: timestamp)")
+    parser.add_argument("--trials", type=int, default=TRIALS)
+    parser.add_argument("--epochs", type=int, default=EPOCHS, help="Max epochs per trial")
+    parser.add_argument("--parallel", type=int, default=PARALLEL, help="Trials running at once")
+    parser.add_argument("--threads", type=int, default=THREADS, help="torch threads per trial")
+    parser.add_argument("--pruner", choices=list(PRUNERS), default="median")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--store", default=STORE_PATH, help="SQLite file holding every trial's config and metrics")
+    parser.add_argument("--show", metavar="SWEEP", help="Print the leaderboard of a stored sweep and exit")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.show:
+        store = TrialStore(args.store)
+        print_leaderboard(store, args.show, limit=1000)
+        store.close()
+    else:
+        run_sweep(args)
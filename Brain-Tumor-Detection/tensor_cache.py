@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import torch
+from PIL import Image
+from torch.utils.data import Dataset, DataLoader
+from torchvision import datasets, transforms
+from tqdm import tqdm
+
+from preprocess import IMG_SIZE, MEAN, STD
+
+# --- PATHS ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_ROOT = os.path.abspath(os.path.join(BASE_DIR, "..", "data"))
+CACHE_ROOT = os.path.join(DATA_ROOT, "tensor_cache")
+
+# Bump when the on-disk layout or the decode/resize recipe changes
+CACHE_VERSION = 1
+BUILD_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+
+# --- FINGERPRINT ---
+def fingerprint(samples, classes):
+    # Any added, removed, renamed or rewritten image changes the hash,
+    # which is what triggers an automatic rebuild.
+    h = hashlib.sha1()
+    h.update(json.dumps({"version": CACHE_VERSION, "size": list(IMG_SIZE), "classes": classes}).encode())
+    for path, label in samples:
+        st = os.stat(path)
+        h.update(f"{path}|{label}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+# --- ONE-TIME BUILD ---
+class _DecodeDataset(Dataset):
+    def __init__(self, samples):
+        self.samples = samples
+        self.resize = transforms.Resize(IMG_SIZE)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, idx):
+        img = Image.open(self.samples[idx][0]).convert('RGB')
+        img = self.resize(img)
+        # uint8 CHW, exactly what ToTensor would see before dividing by 255
+        return torch.from_numpy(np.asarray(img, dtype=np.uint8).copy()).permute(2, 0, 1)
+
+
+def build_cache(samples, classes, cache_dir, num_workers=BUILD_WORKERS):
+    os.makedirs(cache_dir, exist_ok=True)
+    n = len(samples)
+    images_tmp = os.path.join(cache_dir, "images.npy.tmp")
+    labels_tmp = os.path.join(cache_dir, "labels.npy.tmp")
+
+    images = np.lib.format.open_memmap(images_tmp, mode="w+", dtype=np.uint8, shape=(n, 3, *IMG_SIZE))
+    labels = np.array([label for _, label in samples], dtype=np.int64)
+
+    loader = DataLoader(_DecodeDataset(samples), batch_size=64, num_workers=num_workers)
+    offset = 0
+    for batch in tqdm(loader, desc=f"Caching {os.path.basename(cache_dir)}"):
+        images[offset:offset + len(batch)] = batch.numpy()
+        offset += len(batch)
+    images.flush()
+    del images
+
+    with open(labels_tmp, "wb") as f:
+        np.save(f, labels)
+
+    # Swap files in first, write the meta last: a half-built cache never
+    # carries a valid fingerprint.
+    os.replace(images_tmp, os.path.join(cache_dir, "images.npy"))
+    os.replace(labels_tmp, os.path.join(cache_dir, "labels.npy"))
+    meta = {
+        "fingerprint": fingerprint(samples, classes),
+        "classes": classes,
+        "count": n,
+        "paths": [path for path, _ in samples],
+    }
+    with open(os.path.join(cache_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+
+def _read_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def ensure_cache(samples, classes, cache_dir, num_workers=BUILD_WORKERS):
+    meta = _read_meta(cache_dir)
+    if meta is None or meta.get("fingerprint") != fingerprint(samples, classes):
+        print(f"🔄 Building tensor cache: {cache_dir}")
+        build_cache(samples, classes, cache_dir, num_workers=num_workers)
+    return cache_dir
+
+
+# --- DATASET (NO PIL IN THE LOOP) ---
+class CachedTensorDataset(Dataset):
+    def __init__(self, cache_dir, normalize=True):
+        self.cache_dir = cache_dir
+        meta = _read_meta(cache_dir)
+        if meta is None:
+            raise FileNotFoundError(f"No tensor cache at {cache_dir}")
+        self.classes = meta["classes"]
+        self.paths = meta["paths"]
+        self.targets = np.load(os.path.join(cache_dir, "labels.npy"))
+        self.normalize = normalize
+        self.mean = torch.tensor(MEAN).view(3, 1, 1)
+        self.std = torch.tensor(STD).view(3, 1, 1)
+        # Opened lazily so each DataLoader worker maps the file itself
+        self._images = None
+
+    def __len__(self):
+        return len(self.targets)
+
+    @property
+    def images(self):
+        if self._images is None:
+            self._images = np.load(os.path.join(self.cache_dir, "images.npy"), mmap_mode="r")
+        return self._images
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_images"] = None
+        return state
+
+    def __getitem__(self, idx):
+        img = torch.from_numpy(np.array(self.images[idx]))
+        if self.normalize:
+            img = (img.float().div_(255) - self.mean) / self.std
+        return img, int(self.targets[idx])
+
+
+def cached_samples(samples, classes, name, cache_root=CACHE_ROOT, num_workers=BUILD_WORKERS, normalize=True):
+    # Any (path, label) list, e.g. one split of the manifest.
+    # normalize=False hands out raw uint8 for preprocess.normalize_batch().
+    cache_dir = os.path.join(cache_root, name)
+    ensure_cache(samples, classes, cache_dir, num_workers=num_workers)
+    return CachedTensorDataset(cache_dir, normalize=normalize)
+
+
+def cached_image_folder(split_dir, cache_root=CACHE_ROOT, num_workers=BUILD_WORKERS, normalize=True):
+    # Drop-in replacement for datasets.ImageFolder(split_dir, transform=...)
+    # (ImageFolder only lists files here; nothing is decoded.)
+    folder = datasets.ImageFolder(split_dir)
+    name = os.path.basename(os.path.normpath(split_dir))
+    return cached_samples(folder.samples, folder.classes, name, cache_root, num_workers, normalize)
+
+
+if __name__ == "__main__":
+    from manifest import load_split
+
+    for split in ["train", "val", "test"]:
+        try:
+            ds = load_split(split)
+        except FileNotFoundError as e:
+            print(f"⚠️ Skipping {split}: {e}")
+            continue
+        print(f"✅ {split}: {len(ds)} images cached")
@@ -1,106 +1,448 @@
 import torch
+import torch.distributed as dist
 import torch.nn as nn
+import torch.nn.functional as F
 import torch.optim as optim
-from torch.utils.data import DataLoader
-from torchvision import datasets, transforms
+from torch.nn.parallel import DistributedDataParallel as DDP
+from torch.utils.data import DataLoader, DistributedSampler
 from torchmetrics.classification import MulticlassF1Score, MulticlassAccuracy, MulticlassPrecision, MulticlassRecall
 from tqdm import tqdm
+import argparse
+import contextlib
 import os
+import time
 
 # Import the new architecture from your model.py
 from model import BrainTumorModel
+from manifest import load_split
+from preprocess import IMG_SIZE, normalize_batch
+from profiling import StageProfiler
+from checkpoint import MetricTracker, capture_rng_state, load_checkpoint, restore_rng_state, save_checkpoint
 
 # --- DYNAMIC PATH MANAGEMENT ---
 # This finds the absolute path of the current script (inside 'models')
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 # This goes up one level to the project root to find the 'data' folder
 DATA_ROOT = os.path.abspath(os.path.join(BASE_DIR, "..", "data"))
-
-TRAIN_PATH = os.path.join(DATA_ROOT, "train")
-VAL_PATH = os.path.join(DATA_ROOT, "val")
+CHECKPOINT_DIR = os.path.join(BASE_DIR, "checkpoints")
+TRACE_DIR = os.path.join(BASE_DIR, "traces")
+LAST_CHECKPOINT = os.path.join(CHECKPOINT_DIR, "last.pt")
+BEST_CHECKPOINT = os.path.join(CHECKPOINT_DIR, "best.pt")
+# The app/eval weights file always holds the best-recall epoch
+SAVE_PATH = os.path.join(BASE_DIR, "brain_tumor_attention_v1.pth")
 
 # --- CONFIGURATION ---
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 BATCH_SIZE = 16  # Optimized for RTX 1650 4GB VRAM
 EPOCHS = 15
 LEARNING_RATE = 0.0001
+DROPOUT = 0.4
+SE_REDUCTION = 16  # Squeeze-and-Excitation bottleneck: in_features // SE_REDUCTION
+PATIENCE = 4  # Epochs without val-recall improvement before stopping (0 = never stop)
+# Decode every JPEG once into a uint8 memmap instead of once per epoch
+USE_TENSOR_CACHE = True
+NUM_WORKERS = 2  # DataLoader workers per process
+# Progressive resizing: early epochs train on downscaled images (several times
+# cheaper), the last FINAL_EPOCHS always run at the serving resolution.
+RESOLUTIONS = [128, 176, IMG_SIZE[0]]
+FINAL_EPOCHS = 5
+MAX_BATCH_SIZE = 128  # Cap for the auto-scaled low-resolution batch size
+
+# --- DISTRIBUTED (set by torchrun; single process otherwise) ---
+RANK = 0
+WORLD_SIZE = 1
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the EfficientNet-B0 + SE-Attention tumor classifier.")
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Micro-batch size per forward pass")
+    parser.add_argument("--lr", type=float, default=LEARNING_RATE)
+    parser.add_argument("--dropout", type=float, default=DROPOUT)
+    parser.add_argument("--se-reduction", type=int, default=SE_REDUCTION)
+    # Fast mode: autocast + channels_last + torch.compile
+    parser.add_argument("--fast", action="store_true", help="Enable mixed precision, channels_last and torch.compile")
+    parser.add_argument("--no-compile", action="store_true", help="Keep --fast but skip torch.compile")
+    parser.add_argument("--accum-steps", type=int, default=1,
+                        help="Gradient accumulation steps (effective batch = batch-size x accum-steps)")
+    # Checkpointing & early stopping
+    parser.add_argument("--resume", nargs="?", const=LAST_CHECKPOINT, default=None,
+                        help=f"Resume from a full checkpoint (default: {LAST_CHECKPOINT})")
+    parser.add_argument("--checkpoint-every", type=int, default=1, help="Write last.pt every N epochs")
+    parser.add_argument("--patience", type=int, default=PATIENCE)
+    parser.add_argument("--no-save", action="store_true", help="Write no weights or checkpoints (sweep trials)")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS)
+    # Progressive resizing (validation always runs at the serving resolution)
+    parser.add_argument("--progressive", action="store_true", help="Train low-res first, e.g. 128 -> 176 -> 224")
+    parser.add_argument("--resolutions", type=int, nargs="+", default=RESOLUTIONS,
+                        help=f"Training resolutions in order; the last must be {IMG_SIZE[0]}")
+    parser.add_argument("--final-epochs", type=int, default=FINAL_EPOCHS,
+                        help="Epochs at the serving resolution at the end of the schedule")
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    # Profiling: per-stage timing each epoch + a torch.profiler Chrome trace window
+    parser.add_argument("--profile", action="store_true", help="Time data/H2D/forward/backward/optimizer/metric stages")
+    parser.add_argument("--profile-steps", type=int, default=5, help="Training steps captured in the Chrome trace (0 = none)")
+    parser.add_argument("--trace-dir", default=TRACE_DIR)
+    return parser.parse_args(argv)
+
+
+def log(*args, **kwargs):
+    # Only rank 0 talks, so N processes do not print N copies of every line
+    if RANK == 0:
+        print(*args, **kwargs)
+
+
+def setup_distributed():
+    # torchrun exports RANK / WORLD_SIZE / LOCAL_RANK / MASTER_ADDR / MASTER_PORT.
+    #   single node:  torchrun --nproc_per_node=8 train.py
+    #   multi node:   torchrun --nnodes=2 --node_rank=0 --nproc_per_node=8 \
+    #                          --master_addr=<host0> --master_port=29500 train.py
+    global RANK, WORLD_SIZE
+    if int(os.environ.get("WORLD_SIZE", "1")) <= 1:
+        return False
+    dist.init_process_group(backend="gloo")
+    RANK, WORLD_SIZE = dist.get_rank(), dist.get_world_size()
+    local_world = int(os.environ.get("LOCAL_WORLD_SIZE", WORLD_SIZE))
+    # Split the node's cores between the local processes instead of oversubscribing
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // local_world))
+    if DEVICE.type == "cuda":
+        torch.cuda.set_device(int(os.environ.get("LOCAL_RANK", "0")))
+    return True
+
+
+def _load_datasets():
+    # Reads data/manifest.csv (split_data.py) when present, else data/train and data/val
+    try:
+        # --- DATA LOADERS ---
+        # Workers hand over resized uint8; normalisation happens once per batch in to_device()
+        train_dataset = load_split("train", USE_TENSOR_CACHE, uint8=True)
+        val_dataset = load_split("val", USE_TENSOR_CACHE, uint8=True)
+        log(f"✅ Data verified at: {DATA_ROOT}")
+    except FileNotFoundError:
+        print(f"❌ Error: Data folder not found at {DATA_ROOT}. Ensure your 'data' folder is in the root directory.")
+        raise  # Not exit(): under DDP the other ranks must hear about it (see build_loaders)
+    return train_dataset, val_dataset
+
+
+def _all_ranks_ok(ok):
+    # Collective: every rank learns whether any rank failed (doubles as a barrier)
+    flag = torch.tensor([0 if ok else 1], dtype=torch.int32)
+    dist.all_reduce(flag)
+    return flag.item() == 0
+
+
+def _load_datasets_step(should_load):
+    # (datasets or None, ok) for one step of the staged distributed load
+    if not should_load:
+        return None, True
+    try:
+        return _load_datasets(), True
+    except Exception as e:
+        print(f"❌ Rank {RANK}: loading data failed: {e}")
+        return None, False
+
+
+def build_loaders(batch_size, num_workers=NUM_WORKERS, distributed=False):
+    if distributed:
+        # The tensor cache lives on each node's local disk: local rank 0 of every
+        # node builds (or refreshes) it, the node's other ranks wait and then map it.
+        # A failure on any rank is shared, so nobody hangs at the next collective.
+        is_builder = int(os.environ.get("LOCAL_RANK", "0")) == 0
+        datasets_, ok = _load_datasets_step(is_builder)
+        if not _all_ranks_ok(ok):
+            raise RuntimeError("Dataset loading failed on at least one node, see the rank logs above.")
+        if not is_builder:
+            datasets_, ok = _load_datasets_step(True)
+        if not _all_ranks_ok(ok):
+            raise RuntimeError("Dataset loading failed on at least one rank, see the rank logs above.")
+        train_dataset, val_dataset = datasets_
+    else:
+        train_dataset, val_dataset = _load_datasets()
+
+    # Each rank sees its own shard. Val shards are strided and unpadded: every image
+    # is scored exactly once, so the all-reduced recall counts no duplicates
+    # (ranks may differ by one image; validation runs no collectives per batch).
+    train_sampler = DistributedSampler(train_dataset, shuffle=True) if distributed else None
+    val_sampler = range(RANK, len(val_dataset), WORLD_SIZE) if distributed else None
+
+    loader_kwargs = dict(batch_size=batch_size, num_workers=num_workers, persistent_workers=num_workers > 0)
+    train_loader = DataLoader(train_dataset, shuffle=train_sampler is None, sampler=train_sampler, **loader_kwargs)
+    val_loader = DataLoader(val_dataset, sampler=val_sampler, **loader_kwargs)
+    return train_loader, val_loader, train_sampler
+
+
+def load_resume_state(path, distributed):
+    # Checkpoints are written by rank 0 only, so only rank 0's disk has them:
+    # read there and broadcast to the other ranks (None = failed on rank 0)
+    if not distributed:
+        return load_checkpoint(path, DEVICE)
+    holder = [None]
+    if RANK == 0:
+        try:
+            holder[0] = load_checkpoint(path, "cpu")
+        except Exception as e:
+            print(f"❌ Could not load checkpoint {path}: {e}")
+    dist.broadcast_object_list(holder, src=0)
+    if holder[0] is None:
+        raise RuntimeError(f"Resume failed: rank 0 could not load {path}")
+    return holder[0]
+
+
+# --- FAST MODE HELPERS ---
+def autocast_context(enabled):
+    # bfloat16 on CPU (no scaler needed), fp16 + GradScaler on CUDA
+    if not enabled:
+        return contextlib.nullcontext()
+    dtype = torch.float16 if DEVICE.type == "cuda" else torch.bfloat16
+    return torch.autocast(device_type=DEVICE.type, dtype=dtype)
+
+
+def to_device(images, labels, channels_last, prof, size=None):
+    # uint8 batch -> device, then float + normalise in one vectorised pass
+    with prof.stage("host_to_device"):
+        images = images.to(DEVICE, non_blocking=True)
+        labels = labels.to(DEVICE, non_blocking=True)
+    with prof.stage("decode_transform"):
+        memory_format = torch.channels_last if channels_last else torch.contiguous_format
+        images = normalize_batch(images, memory_format=memory_format)
+        if size is not None and images.shape[-1] != size:
+            # Progressive resizing: downscale on the device, the cache stays at 224
+            images = F.interpolate(images, size=(size, size), mode="bilinear", antialias=True, align_corners=False)
+            images = images.contiguous(memory_format=memory_format)
+    return images, labels
+
+
+# --- PROGRESSIVE RESIZING ---
+def resolution_schedule(epochs, resolutions, final_epochs):
+    # One resolution per epoch: the last `final_epochs` at the serving size, the
+    # rest split evenly (earlier stages get the remainder) over the lower ones
+    if resolutions[-1] != IMG_SIZE[0]:
+        raise ValueError(f"The last resolution must be the serving size {IMG_SIZE[0]}, got {resolutions[-1]}")
+    final_epochs = min(max(1, final_epochs), epochs)
+    lower, early = resolutions[:-1], epochs - final_epochs
+    schedule = []
+    for i, res in enumerate(lower):
+        schedule += [res] * (early // len(lower) + (1 if i < early % len(lower) else 0))
+    return schedule + [resolutions[-1]] * (epochs - len(schedule))
+
+
+def stage_batch_size(base, resolution, cap=MAX_BATCH_SIZE):
+    # Same pixels per step as the full-resolution batch, rounded down to a multiple of 8
+    scaled = int(base * (IMG_SIZE[0] / resolution) ** 2)
+    return max(base, min(cap, scaled // 8 * 8))
+
+
+def stage_lr(base_lr, batch_size, base_batch_size):
+    # Larger low-res batches take fewer, less noisy steps; square-root scaling
+    # (the usual rule for Adam) keeps the per-epoch update size comparable
+    return base_lr * (batch_size / base_batch_size) ** 0.5
+
+
+def stage_loader(train_loader, batch_size, num_workers, train_sampler=None):
+    # Same dataset and sampler, new batch size
+    return DataLoader(train_loader.dataset, batch_size=batch_size, shuffle=train_sampler is None,
+                      sampler=train_sampler, num_workers=num_workers, persistent_workers=num_workers > 0)
 
-# --- DATA AUGMENTATION & LOADERS ---
-transform = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
-    transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
-])
-
-# Loading datasets using absolute paths
-try:
-    train_dataset = datasets.ImageFolder(TRAIN_PATH, transform=transform)
-    val_dataset = datasets.ImageFolder(VAL_PATH, transform=transform)
-    print(f"✅ Data verified at: {DATA_ROOT}")
-except FileNotFoundError:
-    print(f"❌ Error: Data folder not found at {DATA_ROOT}. Ensure your 'data' folder is in the root directory.")
-    exit()
-
-train_loader = DataLoader(train_dataset, batch_size=BATCH_SIZE, shuffle=True)
-val_loader = DataLoader(val_dataset, batch_size=BATCH_SIZE)
-
-# --- MODEL INITIALIZATION ---
-model = BrainTumorModel(num_classes=4).to(DEVICE)
-criterion = nn.CrossEntropyLoss()
-optimizer = optim.Adam(model.parameters(), lr=LEARNING_RATE)
-
-# --- PERFORMANCE METRICS ---
-f1_metric = MulticlassF1Score(num_classes=4, average='macro').to(DEVICE)
-acc_metric = MulticlassAccuracy(num_classes=4).to(DEVICE)
-prec_metric = MulticlassPrecision(num_classes=4, average='macro').to(DEVICE)
-rec_metric = MulticlassRecall(num_classes=4, average='macro').to(DEVICE)
 
 # --- TRAINING ENGINE ---
-print(f"🚀 Initializing Training Engine on: {DEVICE}")
-
-for epoch in range(EPOCHS):
-    model.train()
-    running_loss = 0.0
-    
-    train_bar = tqdm(train_loader, desc=f"Epoch {epoch+1}/{EPOCHS} [Training]")
-    for images, labels in train_bar:
-        images, labels = images.to(DEVICE), labels.to(DEVICE)
-        
-        optimizer.zero_grad()
-        outputs = model(images)
-        loss = criterion(outputs, labels)
-        loss.backward()
-        optimizer.step()
-        
-        running_loss += loss.item()
-        train_bar.set_postfix(loss=loss.item())
-
-    # --- VALIDATION PHASE ---
-    model.eval()
-    with torch.no_grad():
-        for images, labels in val_loader:
-            images, labels = images.to(DEVICE), labels.to(DEVICE)
-            preds = model(images)
-            
-            # Record Performance
-            f1_metric.update(preds, labels)
-            acc_metric.update(preds, labels)
-            prec_metric.update(preds, labels)
-            rec_metric.update(preds, labels)
-            
-    # Final Epoch Report
-    print(f"\n📈 Performance Metrics (Epoch {epoch+1}):")
-    print(f"Avg Loss:  {running_loss/len(train_loader):.4f}")
-    print(f"Accuracy:  {acc_metric.compute():.4f}")
-    print(f"F1 Score:  {f1_metric.compute():.4f}")
-    print(f"Precision: {prec_metric.compute():.4f}")
-    print(f"Recall:    {rec_metric.compute():.4f}") # Critical for medical diagnosis
-    
-    # Reset for next epoch
-    for m in [f1_metric, acc_metric, prec_metric, rec_metric]:
-        m.reset()
-
-# --- SAVE FINAL WEIGHTS ---
-SAVE_PATH = os.path.join(BASE_DIR, "brain_tumor_attention_v1.pth")
-torch.save(model.state_dict(), SAVE_PATH)
-print(f"\n🎉 Process Complete. Model saved at: {SAVE_PATH}")
\ No newline at end of file
+def train(args, on_epoch=None):
+    # on_epoch(epoch, results) is called after each validation pass; returning
+    # False stops the run (sweep.py uses it to prune losing trials)
+    distributed = setup_distributed()
+    train_loader, val_loader, train_sampler = build_loaders(args.batch_size, args.workers, distributed)
+
+    # --- MODEL INITIALIZATION ---
+    model = BrainTumorModel(num_classes=4, dropout=args.dropout, se_reduction=args.se_reduction).to(DEVICE)
+    if args.fast:
+        model = model.to(memory_format=torch.channels_last)
+    # `model` keeps the plain module so the saved state_dict has no DDP/compile prefixes
+    ddp_model = DDP(model) if distributed else None
+    run_model = ddp_model or model
+    if args.fast and not args.no_compile:
+        run_model = torch.compile(run_model)
+
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.parameters(), lr=args.lr)
+    scaler = torch.cuda.amp.GradScaler(enabled=args.fast and DEVICE.type == "cuda")
+    accum_steps = max(1, args.accum_steps)
+
+    # --- PERFORMANCE METRICS ---
+    # Under DDP torchmetrics all-reduces its states inside compute(), so every
+    # rank sees the same global numbers (and takes the same early-stop decision).
+    tracker = MetricTracker({
+        "f1": MulticlassF1Score(num_classes=4, average='macro').to(DEVICE),
+        "accuracy": MulticlassAccuracy(num_classes=4).to(DEVICE),
+        "precision": MulticlassPrecision(num_classes=4, average='macro').to(DEVICE),
+        "recall": MulticlassRecall(num_classes=4, average='macro').to(DEVICE),
+    }, monitor="recall", patience=args.patience)
+
+    # Disabled unless --profile: stage() is then a shared no-op context
+    prof = StageProfiler(args.profile and RANK == 0, args.trace_dir, trace_active=args.profile_steps, name="train")
+
+    # --- RESUME ---
+    start_epoch = 0
+    if args.resume:
+        ckpt = load_resume_state(args.resume, distributed)
+        model.load_state_dict(ckpt["model"])
+        optimizer.load_state_dict(ckpt["optimizer"])
+        scaler.load_state_dict(ckpt["scaler"])
+        tracker.load_state_dict(ckpt["tracker"])
+        restore_rng_state(ckpt["rng"])
+        start_epoch = ckpt["epoch"] + 1
+        log(f"♻️ Resumed from {args.resume} at epoch {start_epoch+1} "
+              f"(best recall {tracker.best:.4f} @ epoch {tracker.best_epoch+1})")
+
+    def full_state(epoch):
+        return {
+            "epoch": epoch,
+            "model": model.state_dict(),
+            "optimizer": optimizer.state_dict(),
+            "scaler": scaler.state_dict(),
+            "tracker": tracker.state_dict(),
+            "rng": capture_rng_state(),
+            "args": vars(args),
+        }
+
+    log(f"🚀 Initializing Training Engine on: {DEVICE}")
+    if distributed:
+        log(f"🌐 DistributedDataParallel (gloo): {WORLD_SIZE} processes, "
+            f"{torch.get_num_threads()} threads each, global batch {args.batch_size * WORLD_SIZE}")
+    if args.fast:
+        log(f"⚡ Fast mode: autocast={'fp16' if DEVICE.type == 'cuda' else 'bf16'}, channels_last, "
+              f"compile={'off' if args.no_compile else 'on'}")
+    if accum_steps > 1:
+        log(f"   Effective batch size: {args.batch_size * accum_steps * WORLD_SIZE} ({args.batch_size} x {accum_steps} steps)")
+
+    # Fixed serving resolution unless --progressive
+    if args.progressive:
+        schedule = resolution_schedule(args.epochs, args.resolutions, args.final_epochs)
+        stages = [(res, schedule.count(res), stage_batch_size(args.batch_size, res, args.max_batch_size))
+                  for res in dict.fromkeys(schedule)]
+        log("📐 Progressive resizing: " + " -> ".join(
+            f"{r}px x{n} (batch {b}, lr {stage_lr(args.lr, b, args.batch_size):.2e})" for r, n, b in stages))
+    else:
+        schedule = [IMG_SIZE[0]] * args.epochs
+    final_res = schedule[-1]
+    first_final_epoch = schedule.index(final_res)
+    stage_loaders = {args.batch_size: train_loader}
+
+    pruned = False
+    for epoch in range(start_epoch, args.epochs):
+        resolution = schedule[epoch]
+        batch_size = args.batch_size
+        if args.progressive:
+            batch_size = stage_batch_size(args.batch_size, resolution, args.max_batch_size)
+        if batch_size not in stage_loaders:
+            stage_loaders[batch_size] = stage_loader(stage_loaders[args.batch_size], batch_size, args.workers, train_sampler)
+        train_loader = stage_loaders[batch_size]
+        for group in optimizer.param_groups:
+            group["lr"] = stage_lr(args.lr, batch_size, args.batch_size)
+        if epoch == first_final_epoch and first_final_epoch > 0:
+            # Epochs trained at low resolution do not compete for "best":
+            # best model and patience both start over at full resolution
+            tracker.best, tracker.best_epoch, tracker.bad_epochs = float("-inf"), -1, 0
+        model.train()
+        if train_sampler is not None:
+            train_sampler.set_epoch(epoch)  # New shuffle per epoch, identical across ranks
+        running_loss = 0.0
+        images_seen = 0
+        optimizer_steps = 0
+
+        train_bar = tqdm(train_loader, desc=f"Epoch {epoch+1}/{args.epochs} [Training {resolution}px]", disable=RANK != 0)
+        optimizer.zero_grad(set_to_none=True)
+        epoch_start = time.perf_counter()
+        for step, (images, labels) in enumerate(prof.iter(train_bar)):
+            images, labels = to_device(images, labels, args.fast, prof, resolution)
+            # Step once per accumulation window (and on the last, possibly short, window)
+            is_step = (step + 1) % accum_steps == 0 or (step + 1) == len(train_loader)
+
+            # Skip the gradient all-reduce on micro-batches that do not step
+            sync = contextlib.nullcontext() if is_step or not distributed else ddp_model.no_sync()
+            with sync:
+                with prof.stage("forward"), autocast_context(args.fast):
+                    outputs = run_model(images)
+                    loss = criterion(outputs, labels)
+                with prof.stage("backward"):
+                    scaler.scale(loss / accum_steps).backward()
+
+            if is_step:
+                with prof.stage("optimizer_step"):
+                    scaler.step(optimizer)
+                    scaler.update()
+                    optimizer.zero_grad(set_to_none=True)
+                optimizer_steps += 1
+
+            running_loss += loss.item()
+            images_seen += images.size(0)
+            train_bar.set_postfix(loss=loss.item())
+            prof.step()
+        if DEVICE.type == "cuda":
+            torch.cuda.synchronize()
+        train_time = time.perf_counter() - epoch_start
+
+        avg_loss = running_loss / len(train_loader)
+        if distributed:
+            # Global view: mean loss over ranks, images summed over ranks
+            stats = torch.tensor([avg_loss, images_seen], dtype=torch.float64)
+            dist.all_reduce(stats)
+            avg_loss, images_seen = stats[0].item() / WORLD_SIZE, int(stats[1].item())
+
+        # --- VALIDATION PHASE ---
+        model.eval()
+        with torch.no_grad(), autocast_context(args.fast):
+            for images, labels in prof.iter(val_loader):
+                images, labels = to_device(images, labels, args.fast, prof)
+                with prof.stage("forward"):
+                    preds = run_model(images).float()
+
+                # Record Performance
+                with prof.stage("metric_update"):
+                    tracker.update(preds, labels)
+
+        # compute() + reset() for next epoch, and best/patience bookkeeping
+        results, improved = tracker.end_epoch(epoch)
+
+        # Final Epoch Report
+        log(f"\n📈 Performance Metrics (Epoch {epoch+1}):")
+        log(f"Avg Loss:  {avg_loss:.4f}")
+        log(f"Accuracy:  {results['accuracy']:.4f}")
+        log(f"F1 Score:  {results['f1']:.4f}")
+        log(f"Precision: {results['precision']:.4f}")
+        log(f"Recall:    {results['recall']:.4f}") # Critical for medical diagnosis
+        log(f"Resolution: {resolution}px (batch {batch_size})")
+        log(f"Step Time: {1000 * train_time / max(1, optimizer_steps):.1f} ms/step")
+        log(f"Throughput: {images_seen / train_time:.1f} img/s")
+        prof.report(f"Epoch {epoch+1}, train + val")
+
+        # --- CHECKPOINTS (rank 0 only; all ranks hold identical weights) ---
+        if RANK == 0 and not args.no_save:
+            # The weights file only ever holds a full-resolution epoch
+            if improved and epoch >= first_final_epoch:
+                save_checkpoint(full_state(epoch), BEST_CHECKPOINT)
+                save_checkpoint(model.state_dict(), SAVE_PATH)
+                log(f"🏆 New best recall {tracker.best:.4f}. Weights saved at: {SAVE_PATH}")
+            if (epoch + 1) % args.checkpoint_every == 0 or tracker.should_stop or (epoch + 1) == args.epochs:
+                save_checkpoint(full_state(epoch), LAST_CHECKPOINT)
+
+        # The callback sees every epoch, including the one early stopping ends on
+        if on_epoch is not None and on_epoch(epoch, results) is False:
+            pruned = True
+            log(f"✂️ Stopped by the epoch callback after epoch {epoch+1}.")
+            break
+        # Never stop before the serving-resolution epochs have run
+        if tracker.should_stop and epoch >= first_final_epoch:
+            log(f"⏹️ Early stopping: no recall improvement for {tracker.bad_epochs} epochs.")
+            break
+
+    prof.close()
+
+    # --- FINAL WEIGHTS ---
+    log(f"\n🎉 Process Complete. Best recall {tracker.best:.4f} (epoch {tracker.best_epoch+1}). "
+        f"{'Nothing saved (--no-save).' if args.no_save else f'Model saved at: {SAVE_PATH}'}")
+    if distributed:
+        dist.destroy_process_group()
+    return {"best_recall": tracker.best, "best_epoch": tracker.best_epoch, "epochs_run": len(tracker.history),
+            "pruned": pruned, "history": tracker.history}
+
+
+if __name__ == "__main__":
+    train(parse_args())
@@ -0,0 +1,125 @@
+import argparse
+import os
+import time
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torchmetrics.classification import MulticlassF1Score, MulticlassAccuracy, MulticlassPrecision, MulticlassRecall
+
+from checkpoint import MetricTracker, save_checkpoint
+from feature_cache import load_features
+from model import BrainTumorModel, load_weights
+
+# --- PATHS ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "brain_tumor_attention_v1.pth")
+SAVE_PATH = os.path.join(BASE_DIR, "brain_tumor_head_v1.pth")
+
+# --- CONFIGURATION ---
+DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+BATCH_SIZE = 128
+EPOCHS = 50
+LEARNING_RATE = 0.001
+DROPOUT = 0.4
+PATIENCE = 10
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Head-only fine-tuning on cached, frozen EfficientNet-B0 features.")
+    parser.add_argument("--weights", default=MODEL_PATH,
+                        help="Backbone (and starting head) weights; ImageNet backbone if the file is missing")
+    parser.add_argument("--output", default=SAVE_PATH)
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--lr", type=float, default=LEARNING_RATE)
+    parser.add_argument("--weight-decay", type=float, default=0.0)
+    parser.add_argument("--dropout", type=float, default=DROPOUT)
+    parser.add_argument("--patience", type=int, default=PATIENCE)
+    parser.add_argument("--reinit-head", action="store_true", help="Start the SE-attention + classifier from scratch")
+    return parser.parse_args()
+
+
+def build_model(weights_path, reinit_head=False, dropout=DROPOUT):
+    # ImageNet backbone only when there is no checkpoint to overwrite it
+    exists = os.path.exists(weights_path)
+    model = BrainTumorModel(num_classes=4, pretrained=not exists, dropout=dropout)
+    if exists:
+        model.load_state_dict(load_weights(weights_path))
+        print(f"✅ Loaded weights from: {weights_path}")
+    else:
+        print(f"⚠️ {weights_path} not found. Using the ImageNet backbone and a fresh head.")
+    if reinit_head:
+        for module in list(model.attention) + list(model.classifier):
+            if isinstance(module, nn.Linear):
+                module.reset_parameters()
+
+    # Frozen backbone: no grads, BatchNorm statistics never move
+    for param in model.base_model.parameters():
+        param.requires_grad = False
+    return model.to(DEVICE)
+
+
+def train_head(args):
+    model = build_model(args.weights, args.reinit_head, args.dropout)
+
+    # Pooled 1280-d features, computed once per image and reused every epoch
+    train_x, train_y = load_features(model, "train", DEVICE)
+    val_x, val_y = load_features(model, "val", DEVICE)
+    train_x = torch.from_numpy(train_x[:]).to(DEVICE)
+    train_y = torch.from_numpy(train_y).to(DEVICE)
+    val_x = torch.from_numpy(val_x[:]).to(DEVICE).float()
+    val_y = torch.from_numpy(val_y).to(DEVICE)
+    print(f"📦 Features: train {tuple(train_x.shape)}, val {tuple(val_x.shape)} (float16 on disk)")
+
+    head_params = list(model.attention.parameters()) + list(model.classifier.parameters())
+    optimizer = optim.Adam(head_params, lr=args.lr, weight_decay=args.weight_decay)
+    criterion = nn.CrossEntropyLoss()
+
+    tracker = MetricTracker({
+        "f1": MulticlassF1Score(num_classes=4, average='macro').to(DEVICE),
+        "accuracy": MulticlassAccuracy(num_classes=4).to(DEVICE),
+        "precision": MulticlassPrecision(num_classes=4, average='macro').to(DEVICE),
+        "recall": MulticlassRecall(num_classes=4, average='macro').to(DEVICE),
+    }, monitor="recall", patience=args.patience)
+
+    print(f"🚀 Training head only on: {DEVICE}")
+    best_head = None
+    for epoch in range(args.epochs):
+        start = time.perf_counter()
+        model.attention.train()
+        model.classifier.train()
+        running_loss = 0.0
+        order = torch.randperm(len(train_x), device=DEVICE)
+        batches = range(0, len(order), args.batch_size)
+        for i in batches:
+            idx = order[i:i + args.batch_size]
+            optimizer.zero_grad(set_to_none=True)
+            loss = criterion(model.forward_head(train_x[idx].float()), train_y[idx])
+            loss.backward()
+            optimizer.step()
+            running_loss += loss.item()
+
+        model.eval()
+        with torch.no_grad():
+            tracker.update(model.forward_head(val_x), val_y)
+        results, improved = tracker.end_epoch(epoch)
+        elapsed = time.perf_counter() - start
+
+        print(f"Epoch {epoch+1:>3}/{args.epochs}  loss {running_loss/len(batches):.4f}  "
+              f"acc {results['accuracy']:.4f}  f1 {results['f1']:.4f}  recall {results['recall']:.4f}  "
+              f"({elapsed*1000:.0f} ms){'  🏆' if improved else ''}")
+
+        if improved:
+            best_head = {k: v.detach().clone() for k, v in model.state_dict().items()}
+        if tracker.should_stop:
+            print(f"⏹️ Early stopping: no recall improvement for {tracker.bad_epochs} epochs.")
+            break
+
+    # Full state_dict (frozen backbone + best head): loads in app.py / eval_test.py as-is
+    save_checkpoint(best_head, args.output)
+    print(f"\n🎉 Best recall {tracker.best:.4f} (epoch {tracker.best_epoch+1}). Model saved at: {args.output}")
+
+
+if __name__ == "__main__":
+    train_head(parse_args())
@@ -0,0 +1,85 @@
+import torch
+import torch.nn.functional as F
+
+# --- TEST-TIME AUGMENTATION ---
+# All views of a batch are stacked into one tensor and scored in a single
+# forward pass, so TTA costs one (bigger) batch instead of N sequential calls.
+VIEWS = ["identity", "hflip", "vflip", "shift_left", "shift_right", "shift_up", "shift_down", "crop"]
+# vflip is off by default: axial MRI slices are not vertically symmetric
+DEFAULT_VIEWS = ["identity", "hflip", "shift_left", "shift_right", "crop"]
+RULES = ["mean", "max", "entropy"]
+SHIFT_PX = 8
+CROP_FRAC = 0.9
+
+# (dx, dy) in units of SHIFT_PX; positive moves the content right / down
+_SHIFTS = {"shift_left": (-1, 0), "shift_right": (1, 0), "shift_up": (0, -1), "shift_down": (0, 1)}
+
+
+def _shift(images, dx, dy):
+    # Edge-replicated translation (no wrap-around like torch.roll)
+    h, w = images.shape[-2:]
+    s = max(abs(dx), abs(dy))
+    padded = F.pad(images, (s, s, s, s), mode="replicate")
+    return padded[..., s - dy:s - dy + h, s - dx:s - dx + w]
+
+
+def _center_crop(images, frac):
+    # Zoom in: central crop resized back to the input size
+    h, w = images.shape[-2:]
+    ch, cw = int(round(h * frac)), int(round(w * frac))
+    top, left = (h - ch) // 2, (w - cw) // 2
+    crop = images[..., top:top + ch, left:left + cw]
+    return F.interpolate(crop, size=(h, w), mode="bilinear", align_corners=False)
+
+
+def make_views(images, views=DEFAULT_VIEWS, shift=SHIFT_PX, crop=CROP_FRAC):
+    # Normalised (B, 3, H, W) -> (V * B, 3, H, W), view-major
+    out = []
+    for view in views:
+        if view == "identity":
+            out.append(images)
+        elif view == "hflip":
+            out.append(images.flip(-1))
+        elif view == "vflip":
+            out.append(images.flip(-2))
+        elif view in _SHIFTS:
+            dx, dy = _SHIFTS[view]
+            out.append(_shift(images, dx * shift, dy * shift))
+        elif view == "crop":
+            out.append(_center_crop(images, crop))
+        else:
+            raise ValueError(f"Unknown TTA view '{view}'. Choose from: {', '.join(VIEWS)}")
+    return torch.cat(out)
+
+
+def aggregate(probs, rule="mean"):
+    # (V, B, C) softmax outputs -> (B, C) probabilities
+    if rule == "mean":
+        return probs.mean(0)
+    if rule == "max":
+        # Most confident view per class, renormalised
+        peak = probs.max(0).values
+        return peak / peak.sum(-1, keepdim=True)
+    if rule == "entropy":
+        # Confident (low-entropy) views count more
+        entropy = -(probs * probs.clamp_min(1e-12).log()).sum(-1, keepdim=True)
+        weights = 1.0 / (entropy + 1e-6)
+        return (probs * weights).sum(0) / weights.sum(0)
+    raise ValueError(f"Unknown TTA rule '{rule}'. Choose from: {', '.join(RULES)}")
+
+
+class TTABackend:
+    # Wraps any backend/model callable (float batch in, logits out) and keeps that
+    # interface: it returns log-probabilities, so a downstream softmax or argmax
+    # sees exactly the aggregated distribution.
+    def __init__(self, backend, rule="mean", views=DEFAULT_VIEWS):
+        self.backend = backend
+        self.rule = rule
+        self.views = list(views)
+        self.name = f"{getattr(backend, 'name', 'model')}+tta"
+
+    def __call__(self, images):
+        batch = images.size(0)
+        logits = self.backend(make_views(images, self.views))
+        probs = torch.softmax(logits.float(), dim=1).view(len(self.views), batch, -1)
+        return aggregate(probs, self.rule).clamp_min(1e-12).log()
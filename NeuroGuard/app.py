@@ -3,8 +3,9 @@ import torch
 import cv2
 import numpy as np
 import tempfile
-from torchvision import transforms
 from model import DeepfakeDetector
+from sampling import sample_faces
+from packed_store import normalize_frames
 import mediapipe as mp
 import os
 
@@ -12,6 +13,7 @@ import os
 MODEL_PATH = "../models/neuroguard_epoch20.pth" 
 IMG_SIZE = (224, 224)
 SEQ_LENGTH = 10
+SAMPLING_MODE = "uniform"  # Deterministic verdicts; "segment" picks a random frame per segment
 
 # --- PAGE SETUP ---
 st.set_page_config(page_title="NeuroGuard", page_icon="🛡️", layout="wide")
@@ -133,27 +135,11 @@ st.markdown("---")
 
 # --- FACE PROCESSING ---
 def process_video(video_path):
+    # SEQ_LENGTH frames spread over the whole clip (not just the first few),
+    # reached by seeking; face detection runs only on those frames
     mp_face_detection = mp.solutions.face_detection
     face_detection = mp_face_detection.FaceDetection(min_detection_confidence=0.5)
-    cap = cv2.VideoCapture(video_path)
-    frames = []
-    while len(frames) < SEQ_LENGTH:
-        ret, frame = cap.read()
-        if not ret: break
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = face_detection.process(frame_rgb)
-        if results.detections:
-            detection = results.detections[0]
-            bboxC = detection.location_data.relative_bounding_box
-            ih, iw, _ = frame.shape
-            x, y, w, h = int(bboxC.xmin * iw), int(bboxC.ymin * ih), int(bboxC.width * iw), int(bboxC.height * ih)
-            x, y = max(0, x - 20), max(0, y - 20)
-            w, h = min(iw, w + 40), min(ih, h + 40)
-            face = frame_rgb[y:y+h, x:x+w]
-            if face.size > 0:
-                face = cv2.resize(face, IMG_SIZE)
-                frames.append(face)
-    cap.release()
+    frames, _ = sample_faces(video_path, face_detection, SEQ_LENGTH, IMG_SIZE, mode=SAMPLING_MODE)
     face_detection.close()
     if len(frames) == 0: return np.array([])
     while len(frames) < SEQ_LENGTH: frames.append(frames[-1]) 
@@ -186,14 +172,8 @@ if uploaded_file is not None:
                 if len(raw_frames) == 0:
                     st.error("⚠️ No Face Detected. Try a clearer video.")
                 else:
-                    # Inference
-                    transform = transforms.Compose([
-                        transforms.ToPILImage(),
-                        transforms.ToTensor(),
-                        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-                    ])
-                    tensor_frames = [transform(f) for f in raw_frames]
-                    input_tensor = torch.stack(tensor_frames).unsqueeze(0).to(device)
+                    # Inference: whole (Seq, H, W, 3) uint8 stack normalised in one vectorised pass
+                    input_tensor = normalize_frames(raw_frames, device).unsqueeze(0)
                     
                     with torch.no_grad():
                         output = model(input_tensor)
@@ -0,0 +1,77 @@
+import os
+import re
+import sqlite3
+import time
+
+# --- PERSISTENT CROP INDEX ---
+# video -> frames (in numeric temporal order) -> label, kept in SQLite next to
+# the crops. A category folder is re-listed only when its mtime changed (a file
+# was added or removed), and then only new/removed names are parsed.
+INDEX_NAME = "_index.sqlite"
+CATEGORIES = ["real", "fake"]  # label = position
+
+# {video}_f{frame}_{detection}.jpg, as written by preprocess_all.py --format jpg
+_CROP_RE = re.compile(r"^(?P<video>.+)_f(?P<frame>\d+)_(?P<det>\d+)\.jpg$", re.IGNORECASE)
+
+
+def parse_crop_name(filename):
+    m = _CROP_RE.match(filename)
+    if m is None:
+        return None
+    return m.group("video"), int(m.group("frame")), int(m.group("det"))
+
+
+def _connect(root_dir):
+    conn = sqlite3.connect(os.path.join(root_dir, INDEX_NAME), timeout=60)
+    conn.execute("CREATE TABLE IF NOT EXISTS dirs (category TEXT PRIMARY KEY, mtime_ns INTEGER)")
+    conn.execute("""CREATE TABLE IF NOT EXISTS crops (
+        category TEXT, file TEXT, video TEXT, frame INTEGER, det INTEGER,
+        PRIMARY KEY (category, file))""")
+    conn.execute("CREATE INDEX IF NOT EXISTS crops_order ON crops (category, video, frame, det)")
+    return conn
+
+
+def update_index(root_dir, conn):
+    # Returns the number of (added, removed) crops
+    added = removed = 0
+    for category in CATEGORIES:
+        cat_path = os.path.join(root_dir, category)
+        if not os.path.isdir(cat_path):
+            continue
+        mtime_ns = os.stat(cat_path).st_mtime_ns
+        row = conn.execute("SELECT mtime_ns FROM dirs WHERE category=?", (category,)).fetchone()
+        if row is not None and row[0] == mtime_ns:
+            continue
+
+        on_disk = set(os.listdir(cat_path))
+        indexed = {r[0] for r in conn.execute("SELECT file FROM crops WHERE category=?", (category,))}
+        new_rows = []
+        for f in on_disk - indexed:
+            parsed = parse_crop_name(f)
+            if parsed is not None:  # Skip junk files
+                new_rows.append((category, f) + parsed)
+        gone = [(category, f) for f in indexed - on_disk]
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO crops VALUES (?, ?, ?, ?, ?)", new_rows)
+            conn.executemany("DELETE FROM crops WHERE category=? AND file=?", gone)
+            conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?)", (category, mtime_ns))
+        added += len(new_rows)
+        removed += len(gone)
+    return added, removed
+
+
+def load_video_groups(root_dir):
+    # {video: [(path, label), ...]} with frames in true temporal order (f15 before f100)
+    start = time.perf_counter()
+    conn = _connect(root_dir)
+    added, removed = update_index(root_dir, conn)
+    groups = {}
+    for label, category in enumerate(CATEGORIES):
+        cat_path = os.path.join(root_dir, category)
+        rows = conn.execute("SELECT video, file FROM crops WHERE category=? ORDER BY video, frame, det", (category,))
+        for video, f in rows:
+            groups.setdefault(video, []).append((os.path.join(cat_path, f), label))
+    conn.close()
+    print(f"📇 Index: {len(groups)} videos loaded in {1000 * (time.perf_counter() - start):.0f} ms "
+          f"(+{added} / -{removed} crops since last run)")
+    return groups
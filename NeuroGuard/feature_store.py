@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+
+import cv2
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+from tqdm import tqdm
+
+from packed_store import load_index, normalize_frames, open_faces
+
+# --- FROZEN-CNN FEATURE STORE ---
+# The ResNet50 in DeepfakeDetector never trains, so its 2048-d embedding of a
+# face crop never changes. Compute it once per crop, keep it in one float16
+# memmap, and let training epochs run only the LSTM + classifier.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FEATURE_DIR = os.path.normpath(os.path.join(BASE_DIR, "../data/frame_features"))
+FEATURE_DIM = 2048
+IMG_SIZE = (224, 224)
+
+
+def cnn_hash(model):
+    h = hashlib.sha1()
+    for name, tensor in model.cnn.state_dict().items():
+        h.update(name.encode())
+        h.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return h.hexdigest()
+
+
+# --- FRAME SOURCES (packed arrays or loose JPEGs) ---
+def video_frames(dataset, idx):
+    # (key, label, uint8 (N, H, W, 3) RGB) for every crop of one video
+    entry = dataset.video_list[idx]
+    if isinstance(entry, tuple):
+        # PackedVideoDataset: (category folder, video name, label)
+        cat_path, name, label = entry
+        return f"{os.path.basename(cat_path)}/{name}", label, np.asarray(open_faces(cat_path, name))
+
+    # VideoDataset: [(jpg path, label), ...]
+    frames = []
+    for path, _ in entry:
+        img = cv2.imread(path)
+        if img is None:
+            img = np.zeros((IMG_SIZE[0], IMG_SIZE[1], 3), dtype=np.uint8)  # Corrupt file -> black frame
+        else:
+            img = cv2.cvtColor(cv2.resize(img, IMG_SIZE), cv2.COLOR_BGR2RGB)
+        frames.append(img)
+    key = os.path.basename(entry[0][0]).rsplit("_", 2)[0]
+    return key, entry[0][1], np.stack(frames)
+
+
+def source_listing(dataset):
+    # Cheap description of what the store must contain (no pixel reads):
+    # [key, label, count, digest of the ordered crop identities]. The digest
+    # changes when crops are replaced or reordered, not just added/removed.
+    listing = []
+    for entry in dataset.video_list:
+        if isinstance(entry, tuple):
+            cat_path, name, label = entry
+            index = load_index(cat_path, name)  # (frame, detection) rows, in stored order
+            digest = hashlib.sha1(np.ascontiguousarray(index).tobytes()).hexdigest()
+            listing.append([f"{os.path.basename(cat_path)}/{name}", label, len(index), digest])
+        else:
+            digest = hashlib.sha1("\n".join(os.path.basename(path) for path, _ in entry).encode()).hexdigest()
+            listing.append([os.path.basename(entry[0][0]).rsplit("_", 2)[0], entry[0][1], len(entry), digest])
+    return listing
+
+
+# --- EXTRACTION ---
+def extract(model, dataset, device, feature_dir=FEATURE_DIR, batch_size=64):
+    listing = source_listing(dataset)
+    total = sum(row[2] for row in listing)
+    os.makedirs(feature_dir, exist_ok=True)
+    tmp = os.path.join(feature_dir, "features.npy.tmp")
+    features = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float16, shape=(total, FEATURE_DIM))
+
+    videos, offset = [], 0
+    model.eval()
+    with torch.no_grad():
+        for idx in tqdm(range(len(dataset.video_list)), desc="Extracting ResNet50 embeddings"):
+            key, label, frames = video_frames(dataset, idx)
+            for i in range(0, len(frames), batch_size):
+                batch = normalize_frames(frames[i:i + batch_size], device)
+                emb = model.cnn(batch).flatten(1)
+                features[offset + i:offset + i + len(emb)] = emb.cpu().numpy().astype(np.float16)
+            videos.append({"key": key, "label": label, "start": offset, "count": len(frames)})
+            offset += len(frames)
+    features.flush()
+    del features
+    os.replace(tmp, os.path.join(feature_dir, "features.npy"))
+    return videos
+
+
+def load_or_extract(model, dataset, device, feature_dir=FEATURE_DIR):
+    # Re-extracts only when the CNN weights or the set of videos/crops changed
+    h = hashlib.sha1(cnn_hash(model).encode())
+    h.update(json.dumps(source_listing(dataset)).encode())
+    key = h.hexdigest()
+
+    meta_path = os.path.join(feature_dir, "meta.json")
+    meta = None
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+    if meta is None or meta.get("key") != key:
+        print("🔄 Frame embeddings are stale or missing. Running ResNet50 once over every crop...")
+        videos = extract(model, dataset, device, feature_dir)
+        meta = {"key": key, "dim": FEATURE_DIM, "videos": videos}
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+    else:
+        print(f"✅ Using cached frame embeddings: {feature_dir}")
+
+    features = np.load(os.path.join(feature_dir, "features.npy"), mmap_mode="r")
+    return features, meta["videos"]
+
+
+class FeatureSequenceDataset(Dataset):
+    # (Seq, 2048) embeddings per video, same frame selection as VideoDataset
+    def __init__(self, features, videos, sequence_length=10):
+        self.features = features
+        self.videos = [v for v in videos if v["count"] > 0]
+        self.sequence_length = sequence_length
+
+    def __len__(self):
+        return len(self.videos)
+
+    def __getitem__(self, idx):
+        v = self.videos[idx]
+        rows = self.features[v["start"]:v["start"] + min(v["count"], self.sequence_length)]
+        if len(rows) < self.sequence_length:
+            # Loop short videos, like the image datasets do
+            rows = np.resize(np.asarray(rows), (self.sequence_length, FEATURE_DIM))
+        return torch.from_numpy(np.asarray(rows, dtype=np.float32)), torch.tensor(v["label"], dtype=torch.float32)
@@ -48,6 +48,10 @@ class DeepfakeDetector(nn.Module):
         # Sequence mein wapas todo
         lstm_in = cnn_out.view(batch_size, seq_len, -1)
         
+        return self.forward_features(lstm_in)
+
+    def forward_features(self, lstm_in):
+        # Input: (Batch, Sequence, 2048) CNN embeddings, e.g. cached by feature_store.py
         # LSTM run karo
         lstm_out, _ = self.lstm(lstm_in)
         
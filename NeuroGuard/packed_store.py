@@ -0,0 +1,102 @@
+import os
+import shutil
+
+import numpy as np
+
+# --- PACKED FACE STORAGE ---
+# One video = two files instead of hundreds of loose JPEGs:
+#   <video>.faces.npy  uint8 (N, H, W, 3) RGB crops, contiguous, memory-mappable
+#   <video>.index.npy  int32 (N, 2) frame-index table: (source frame, detection #)
+# Rows are in temporal order, so a sequence is one slice = one sequential read.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PACKED_DIR = os.path.normpath(os.path.join(BASE_DIR, "../data/packed_faces"))
+
+FACES_SUFFIX = ".faces.npy"
+INDEX_SUFFIX = ".index.npy"
+
+# ImageNet statistics the ResNet50 expects; the one place uint8 crops get normalised
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+def normalize_frames(frames, device=None):
+    # uint8 (..., H, W, 3) RGB -> float (..., 3, H, W), normalised in one vectorised pass
+    import torch  # Lazy: the preprocessing workers only need numpy
+    x = torch.as_tensor(np.asarray(frames))
+    if device is not None:
+        x = x.to(device)
+    x = x.movedim(-1, -3).float().div_(255)
+    mean = torch.tensor(IMAGENET_MEAN, device=x.device).view(3, 1, 1)
+    std = torch.tensor(IMAGENET_STD, device=x.device).view(3, 1, 1)
+    return (x - mean) / std
+
+
+def video_paths(folder, video_name):
+    base = os.path.join(folder, video_name)
+    return base + FACES_SUFFIX, base + INDEX_SUFFIX
+
+
+class VideoWriter:
+    # Streams crops to disk as they are produced: only the frame-index table
+    # stays in memory, however long the clip. finish() prepends the .npy header
+    # (the row count is known only then) and renames; atomic, index last, so
+    # readers never see a half-written video.
+    def __init__(self, folder, video_name):
+        self.faces_path, self.index_path = video_paths(folder, video_name)
+        self.raw_path = self.faces_path + ".raw.tmp"
+        self.f = open(self.raw_path, "wb")
+        self.shape = None
+        self.index = []
+
+    def add(self, face, frame_idx, detection):
+        face = np.ascontiguousarray(face, dtype=np.uint8)
+        if self.shape is None:
+            self.shape = face.shape
+        elif face.shape != self.shape:
+            raise ValueError(f"Crop shape {face.shape} != {self.shape}")
+        self.f.write(face.tobytes())
+        self.index.append((frame_idx, detection))
+
+    def finish(self):
+        # Returns the number of crops written (0 = nothing written)
+        self.f.close()
+        if not self.index:
+            os.remove(self.raw_path)
+            return 0
+        header = {"descr": np.lib.format.dtype_to_descr(np.dtype(np.uint8)), "fortran_order": False,
+                  "shape": (len(self.index),) + self.shape}
+        tmp = self.faces_path + ".tmp"
+        with open(tmp, "wb") as out, open(self.raw_path, "rb") as raw:
+            np.lib.format.write_array_header_1_0(out, header)
+            shutil.copyfileobj(raw, out, 1 << 20)  # Chunked copy, constant memory
+        os.replace(tmp, self.faces_path)
+        os.remove(self.raw_path)
+
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.asarray(self.index, dtype=np.int32).reshape(-1, 2))
+        os.replace(tmp, self.index_path)
+        return len(self.index)
+
+    def abort(self):
+        self.f.close()
+        if os.path.exists(self.raw_path):
+            os.remove(self.raw_path)
+
+
+def list_videos(folder):
+    # Video names with a complete (faces + index) pair
+    if not os.path.exists(folder):
+        return []
+    names = set(os.listdir(folder))
+    return sorted(f[:-len(FACES_SUFFIX)] for f in names
+                  if f.endswith(FACES_SUFFIX) and f[:-len(FACES_SUFFIX)] + INDEX_SUFFIX in names)
+
+
+def open_faces(folder, video_name):
+    # Memory-mapped: slicing reads only the requested rows
+    return np.load(video_paths(folder, video_name)[0], mmap_mode="r")
+
+
+def load_index(folder, video_name):
+    return np.load(video_paths(folder, video_name)[1])
@@ -1,92 +1,248 @@
+import argparse
 import cv2
+import json
 import mediapipe as mp
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from tqdm import tqdm
 
+from packed_store import PACKED_DIR, VideoWriter
+
 # --- CONFIGURATION ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 # Force clean paths
 RAW_DATA_DIR = os.path.normpath(os.path.join(BASE_DIR, "../data/raw_videos"))
 PROCESSED_DIR = os.path.normpath(os.path.join(BASE_DIR, "../data/processed_faces"))
+# One JSON line per finished video; reruns skip everything listed here
+PROGRESS_PATH = os.path.join(PROCESSED_DIR, "_progress.jsonl")
 
 FRAME_SKIP = 15  # Har 15th frame save karenge (taaki photos alag dikhein)
 IMG_SIZE = (224, 224)
+# "packed": one uint8 array + frame-index table per video (packed_store.py)
+# "jpg": legacy loose crops, {video}_f{idx}_{i}.jpg
+FORMATS = ["packed", "jpg"]
+OUTPUT_FORMAT = "packed"
+OUTPUT_DIRS = {"packed": PACKED_DIR, "jpg": PROCESSED_DIR}
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov')
+NUM_WORKERS = os.cpu_count() or 1
+IN_FLIGHT_PER_WORKER = 2  # Videos queued per worker; bounds memory however fast workers are
+
+# MediaPipe detector: one per worker process (created in init_worker)
+face_detection = None
+
 
-# Init MediaPipe
-mp_face_detection = mp.solutions.face_detection
-face_detection = mp_face_detection.FaceDetection(min_detection_confidence=0.5)
+def init_worker():
+    global face_detection
+    # Parallelism comes from the process pool; N workers x N OpenCV threads would thrash
+    cv2.setNumThreads(1)
+    mp_face_detection = mp.solutions.face_detection
+    face_detection = mp_face_detection.FaceDetection(min_detection_confidence=0.5)
 
-def process_one_video(video_path, output_folder, video_name):
+
+def process_one_video(video_path, output_folder, video_name, frame_skip=FRAME_SKIP, fmt=OUTPUT_FORMAT):
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         return 0
-    
+
+    # Packed format: crops (RGB) streamed to disk, (frame, detection) rows kept for the index
+    writer = VideoWriter(output_folder, video_name) if fmt == "packed" else None
+    try:
+        count = _extract_faces(cap, output_folder, video_name, frame_skip, fmt, writer)
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    finally:
+        cap.release()
+    if writer is not None:
+        writer.finish()
+    return count
+
+
+def _extract_faces(cap, output_folder, video_name, frame_skip, fmt, writer):
     count = 0
     frame_idx = 0
-    
     while True:
-        success, frame = cap.read()
-        if not success:
+        # grab() only: skipped frames are never converted or copied out
+        if not cap.grab():
             break
-            
+
         frame_idx += 1
-        
+
         # SKIP FRAMES (Space bachane ke liye)
-        if frame_idx % FRAME_SKIP != 0:
+        if frame_idx % frame_skip != 0:
             continue
-            
+
+        success, frame = cap.retrieve()
+        if not success:
+            break
+
         rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         results = face_detection.process(rgb)
-        
+
         if results.detections:
             for i, detection in enumerate(results.detections):
                 bboxC = detection.location_data.relative_bounding_box
                 ih, iw, _ = frame.shape
                 x, y, w, h = int(bboxC.xmin * iw), int(bboxC.ymin * ih), int(bboxC.width * iw), int(bboxC.height * ih)
-                
+
                 # Thoda padding
                 x, y = max(0, x - 20), max(0, y - 20)
                 w, h = min(iw, w + 40), min(ih, h + 40)
-                
-                face = frame[y:y+h, x:x+w]
-                
+
+                face = (rgb if fmt == "packed" else frame)[y:y+h, x:x+w]
+
                 if face.size > 0:
                     try:
                         face = cv2.resize(face, IMG_SIZE)
+                    except:
+                        continue
+                    # Outside the try: a failed write must fail the video, not go missing from the index
+                    if writer is not None:
+                        writer.add(face, frame_idx, i)
+                    else:
                         # Save with unique name
                         fname = f"{video_name}_f{frame_idx}_{i}.jpg"
                         cv2.imwrite(os.path.join(output_folder, fname), face)
-                        count += 1
-                    except:
-                        pass
-    cap.release()
+                    count += 1
     return count
 
-def run():
-    print(f"--- FINAL PROCESSING ---")
-    print(f"Reading from: {RAW_DATA_DIR}")
-    print(f"Saving to: {PROCESSED_DIR}")
-    
+
+def run_task(category, video_path, output_folder, video_name, frame_skip, fmt):
+    # Runs in a worker: returns the progress record for this video
+    start = time.perf_counter()
+    try:
+        faces = process_one_video(video_path, output_folder, video_name, frame_skip, fmt)
+        status, error = "done", None
+    except Exception as e:
+        faces, status, error = 0, "failed", str(e)
+    return {"category": category, "video": video_name, "format": fmt, "faces": faces,
+            "seconds": round(time.perf_counter() - start, 3), "status": status, "error": error}
+
+
+# --- PROGRESS MANIFEST ---
+def load_progress(path=PROGRESS_PATH):
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Torn last line from an interrupted run
+            if record.get("status") == "done":
+                done[(record["category"], record["video"], record.get("format", "jpg"))] = record
+    return done
+
+
+class ProgressWriter:
+    # Append-only; flushed + fsynced per video so a crash loses at most the videos in flight
+    def __init__(self, path=PROGRESS_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.f = open(path, "a")
+
+    def write(self, record):
+        self.f.write(json.dumps(record) + "\n")
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def close(self):
+        self.f.close()
+
+
+def collect_tasks(done, frame_skip, fmt=OUTPUT_FORMAT):
+    tasks, skipped = [], 0
     for category in ["real", "fake"]:
         src_path = os.path.join(RAW_DATA_DIR, category)
-        dst_path = os.path.join(PROCESSED_DIR, category)
+        dst_path = os.path.join(OUTPUT_DIRS[fmt], category)
         os.makedirs(dst_path, exist_ok=True)
-        
+
         if not os.path.exists(src_path):
             print(f"Skipping {category}: Folder not found.")
             continue
-            
-        videos = [f for f in os.listdir(src_path) if f.lower().endswith(('.mp4', '.avi', '.mov'))]
-        print(f"\nProcessing {len(videos)} videos in '{category}'...")
-        
-        total_faces = 0
-        # Progress Bar
-        for v in tqdm(videos):
-            path = os.path.join(src_path, v)
+
+        videos = sorted(f for f in os.listdir(src_path) if f.lower().endswith(VIDEO_EXTENSIONS))
+        for v in videos:
             name = v.split('.')[0]
-            total_faces += process_one_video(path, dst_path, name)
-            
-        print(f"✅ Finished {category}. Total faces saved: {total_faces}")
+            if (category, name, fmt) in done:
+                skipped += 1
+                continue
+            tasks.append((category, os.path.join(src_path, v), dst_path, name, frame_skip, fmt))
+    return tasks, skipped
+
+
+def print_stats(records):
+    if not records:
+        return
+    secs = sorted(r["seconds"] for r in records)
+    for category in ["real", "fake"]:
+        rows = [r for r in records if r["category"] == category and r["status"] == "done"]
+        if rows:
+            no_face = sum(1 for r in rows if r["faces"] == 0)
+            print(f"✅ {category}: {len(rows)} videos, {sum(r['faces'] for r in rows)} faces saved, "
+                  f"{sum(r['faces'] for r in rows) / len(rows):.1f} faces/video, {no_face} with no face")
+    print(f"⏱️ Per video: mean {sum(secs) / len(secs):.2f} s, median {secs[len(secs) // 2]:.2f} s, "
+          f"p95 {secs[min(len(secs) - 1, int(0.95 * len(secs)))]:.2f} s, max {secs[-1]:.2f} s")
+    failed = [r for r in records if r["status"] == "failed"]
+    if failed:
+        print(f"❌ {len(failed)} videos failed (rerun to retry): " + ", ".join(r["video"] for r in failed[:10]))
+
+
+def run(workers=NUM_WORKERS, frame_skip=FRAME_SKIP, in_flight=IN_FLIGHT_PER_WORKER, fmt=OUTPUT_FORMAT):
+    print(f"--- FINAL PROCESSING ---")
+    print(f"Reading from: {RAW_DATA_DIR}")
+    print(f"Saving to: {OUTPUT_DIRS[fmt]} ({fmt})")
+
+    done = load_progress()
+    tasks, skipped = collect_tasks(done, frame_skip, fmt)
+    print(f"\nProcessing {len(tasks)} videos with {workers} workers ({skipped} already done, skipped)...")
+    if not tasks:
+        return
+
+    progress = ProgressWriter()
+    records = []
+    start = time.perf_counter()
+    pending = set()
+    queue = iter(tasks)
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool, tqdm(total=len(tasks)) as bar:
+        # Bounded window: at most workers * in_flight videos submitted at once
+        for task in queue:
+            pending.add(pool.submit(run_task, *task))
+            if len(pending) >= workers * in_flight:
+                break
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                record = future.result()
+                progress.write(record)
+                records.append(record)
+                bar.update(1)
+                bar.set_postfix(faces=sum(r["faces"] for r in records))
+                task = next(queue, None)
+                if task is not None:
+                    pending.add(pool.submit(run_task, *task))
+    progress.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"\n🎉 {len(records)} videos in {elapsed:.0f} s ({len(records) / max(elapsed, 1e-9):.2f} videos/s)")
+    print_stats(records)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract face crops from raw videos (parallel, resumable).")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS)
+    parser.add_argument("--frame-skip", type=int, default=FRAME_SKIP)
+    parser.add_argument("--in-flight", type=int, default=IN_FLIGHT_PER_WORKER, help="Queued videos per worker")
+    parser.add_argument("--format", choices=FORMATS, default=OUTPUT_FORMAT,
+                        help="packed: one array per video (fast training); jpg: loose crops")
+    parser.add_argument("--restart", action="store_true", help="Ignore the progress manifest and redo every video")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    args = parse_args()
+    if args.restart and os.path.exists(PROGRESS_PATH):
+        os.remove(PROGRESS_PATH)
+    run(args.workers, args.frame_skip, args.in_flight, args.format)
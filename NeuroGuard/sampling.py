@@ -0,0 +1,108 @@
+import cv2
+import numpy as np
+
+# --- TEMPORAL SAMPLING ENGINE ---
+# Target frames are spread over the whole clip and reached with grab()/seek,
+# so decode + detect cost depends on the number of samples, not clip length.
+
+SEEK_GAP = 30       # Gap (frames) above which a keyframe seek beats grab()-ing forward
+MAX_RETRIES = 2     # Extra frames tried inside a segment when no face is found
+RETRY_STRIDE = 3    # Frames between retries (neighbouring frames are near-identical)
+
+
+def sample_indices(frame_count, num_samples, mode="uniform", rng=None):
+    # One index per equal-length segment: its centre ("uniform", deterministic)
+    # or a random frame inside it ("segment", TSN-style, for training-time variety)
+    if frame_count <= 0 or num_samples <= 0:
+        return []
+    edges = np.linspace(0, frame_count, num_samples + 1)
+    if mode == "uniform":
+        idx = (edges[:-1] + edges[1:]) / 2
+    elif mode == "segment":
+        rng = rng or np.random.default_rng()
+        idx = rng.uniform(edges[:-1], edges[1:])
+    else:
+        raise ValueError(f"Unknown sampling mode '{mode}' (use 'uniform' or 'segment')")
+    # Short clips: fewer frames than samples -> duplicates removed, caller pads
+    return sorted(set(np.clip(idx.astype(int), 0, frame_count - 1).tolist()))
+
+
+def count_frames(video_path):
+    # Container metadata first; some files report 0 or garbage, then count with grab()
+    cap = cv2.VideoCapture(video_path)
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if count <= 0:
+        count = 0
+        while cap.grab():
+            count += 1
+    cap.release()
+    return count
+
+
+class FrameReader:
+    # Random access on a cv2.VideoCapture that only decodes what it has to:
+    # short forward gaps are grab()-ed (demux + decode, no colour conversion),
+    # long gaps and backward jumps use a keyframe seek.
+    def __init__(self, cap, seek_gap=SEEK_GAP):
+        self.cap = cap
+        self.seek_gap = seek_gap
+        self.pos = 0  # Index of the next frame read() would return
+
+    def read(self, index):
+        gap = index - self.pos
+        if gap < 0 or gap > self.seek_gap:
+            if self.cap.set(cv2.CAP_PROP_POS_FRAMES, index):
+                self.pos = index
+                gap = 0
+            elif gap < 0:
+                return None
+        for _ in range(gap):
+            if not self.cap.grab():
+                return None
+        self.pos = index + 1
+        ok, frame = self.cap.read()
+        return frame if ok else None
+
+
+def detect_face(face_detection, frame_bgr, size, pad=20):
+    # First detection -> padded RGB crop resized to `size`, or None
+    frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+    results = face_detection.process(frame_rgb)
+    if not results.detections:
+        return None
+    bboxC = results.detections[0].location_data.relative_bounding_box
+    ih, iw, _ = frame_bgr.shape
+    x, y, w, h = int(bboxC.xmin * iw), int(bboxC.ymin * ih), int(bboxC.width * iw), int(bboxC.height * ih)
+    x, y = max(0, x - pad), max(0, y - pad)
+    w, h = min(iw, w + 2 * pad), min(ih, h + 2 * pad)
+    face = frame_rgb[y:y+h, x:x+w]
+    if face.size == 0:
+        return None
+    return cv2.resize(face, size)
+
+
+def sample_faces(video_path, face_detection, num_samples, size, mode="uniform", rng=None,
+                 max_retries=MAX_RETRIES, retry_stride=RETRY_STRIDE):
+    # Face crops from `num_samples` frames spread across the clip, in temporal order.
+    # Detection only ever runs on sampled frames (plus a few retries on a miss).
+    frame_count = count_frames(video_path)
+    targets = sample_indices(frame_count, num_samples, mode, rng)
+    cap = cv2.VideoCapture(video_path)
+    reader = FrameReader(cap)
+    faces, used = [], []
+    for i, target in enumerate(targets):
+        limit = targets[i + 1] if i + 1 < len(targets) else frame_count
+        for attempt in range(max_retries + 1):
+            index = target + attempt * retry_stride
+            if index >= limit:
+                break
+            frame = reader.read(index)
+            if frame is None:
+                break
+            face = detect_face(face_detection, frame, size)
+            if face is not None:
+                faces.append(face)
+                used.append(index)
+                break
+    cap.release()
+    return faces, used
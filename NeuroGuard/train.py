@@ -8,10 +8,17 @@ import cv2
 import numpy as np
 from tqdm import tqdm
 from model import DeepfakeDetector
+from packed_store import IMAGENET_MEAN, IMAGENET_STD, PACKED_DIR, list_videos, normalize_frames, open_faces
+from feature_store import FeatureSequenceDataset, load_or_extract
+from dataset_index import load_video_groups
 
 # --- CONFIGURATION (OPTIMIZED) ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "../data/processed_faces")
+# Packed per-video arrays (preprocess_all.py --format packed) are used when present
+USE_PACKED = True
+# ResNet50 is frozen: embed every crop once (feature_store.py) and train only LSTM + fc
+TRAIN_ON_FEATURES = True
 
 # Hyperparameters
 SEQ_LENGTH = 10     
@@ -32,25 +39,14 @@ class VideoDataset(Dataset):
         if not os.path.exists(root_dir):
             raise RuntimeError(f"Data directory not found: {root_dir}")
 
-        # Scan folders
-        for label, category in enumerate(["real", "fake"]):
-            cat_path = os.path.join(root_dir, category)
-            if not os.path.exists(cat_path):
+        for category in ["real", "fake"]:
+            if not os.path.exists(os.path.join(root_dir, category)):
                 print(f"⚠️ Warning: Folder '{category}' not found inside processed_faces!")
-                continue
-            
-            print(f"Scanning {category} images... this might take a moment.")
-            files = sorted(os.listdir(cat_path))
-            
-            # Group images back into videos
-            for file in files:
-                # Expected format: videoName_f1_0.jpg
-                if "_" not in file: continue # Skip junk files
-                
-                video_name = "_".join(file.split("_")[:-2])
-                if video_name not in self.video_groups:
-                    self.video_groups[video_name] = []
-                self.video_groups[video_name].append((os.path.join(cat_path, file), label))
+        
+        # Group images back into videos via the persistent index (dataset_index.py):
+        # only folders changed since the last run are re-listed, and frames come
+        # back in numeric order (videoName_f15_0.jpg before videoName_f100_0.jpg)
+        self.video_groups = load_video_groups(root_dir)
         
         self.video_list = list(self.video_groups.values())
         print(f"✅ Ready to train on {len(self.video_list)} unique video sequences.")
@@ -88,6 +84,40 @@ class VideoDataset(Dataset):
         # Stack images: (Seq_Len, Channels, Height, Width)
         return torch.stack(images), torch.tensor(label, dtype=torch.float32)
 
+# --- PACKED DATASET (one slice per sample, no JPEG decode) ---
+class PackedVideoDataset(Dataset):
+    def __init__(self, root_dir, sequence_length=10):
+        self.root_dir = root_dir
+        self.sequence_length = sequence_length
+        self.video_list = []
+
+        for label, category in enumerate(["real", "fake"]):
+            cat_path = os.path.join(root_dir, category)
+            videos = list_videos(cat_path)
+            if not videos:
+                print(f"⚠️ Warning: No packed videos for '{category}' in {root_dir}")
+            self.video_list += [(cat_path, name, label) for name in videos]
+
+        if not self.video_list:
+            raise RuntimeError(f"No packed videos found in: {root_dir}")
+        print(f"✅ Ready to train on {len(self.video_list)} unique video sequences (packed).")
+
+    def __len__(self):
+        return len(self.video_list)
+
+    def __getitem__(self, idx):
+        cat_path, name, label = self.video_list[idx]
+        faces = open_faces(cat_path, name)
+
+        # Same selection as VideoDataset: first SEQ_LENGTH crops, looped if the video is short
+        if len(faces) >= self.sequence_length:
+            clip = np.asarray(faces[:self.sequence_length])  # One contiguous read
+        else:
+            clip = np.resize(np.asarray(faces), (self.sequence_length,) + faces.shape[1:])
+
+        # (Seq, H, W, 3) uint8 RGB -> normalised (Seq, 3, H, W)
+        return normalize_frames(clip), torch.tensor(label, dtype=torch.float32)
+
 # --- TRAINING ENGINE ---
 def train():
     # CUDA Setup
@@ -102,28 +132,40 @@ def train():
         transforms.ToPILImage(),
         transforms.Resize(IMG_SIZE),
         transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+        transforms.Normalize(mean=IMAGENET_MEAN, std=IMAGENET_STD)
     ])
 
     # Load Data
     try:
-        dataset = VideoDataset(DATA_DIR, sequence_length=SEQ_LENGTH, transform=transform)
+        if USE_PACKED and any(list_videos(os.path.join(PACKED_DIR, c)) for c in ["real", "fake"]):
+            dataset = PackedVideoDataset(PACKED_DIR, sequence_length=SEQ_LENGTH)
+        else:
+            dataset = VideoDataset(DATA_DIR, sequence_length=SEQ_LENGTH, transform=transform)
     except RuntimeError as e:
         print(f"❌ Error: {e}")
         return
 
+    # Load Model
+    model = DeepfakeDetector(pretrained=True).to(device)
+
+    # Feature mode: ResNet50 runs once per crop here, never inside the epoch loop.
+    # The CNN weights stay in the model, so checkpoints load in app.py unchanged.
+    if TRAIN_ON_FEATURES:
+        features, video_table = load_or_extract(model, dataset, device)
+        dataset = FeatureSequenceDataset(features, video_table, sequence_length=SEQ_LENGTH)
+        forward = model.forward_features
+    else:
+        forward = model
+
     # Optimized DataLoader (Workers + Pin Memory)
     dataloader = DataLoader(
         dataset, 
         batch_size=BATCH_SIZE, 
         shuffle=True, 
-        num_workers=2,      # CPU parallel loading (Windows ke liye 2 safe hai)
+        num_workers=0 if TRAIN_ON_FEATURES else 2,  # CPU parallel loading (Windows ke liye 2 safe hai)
         pin_memory=True     # Fast transfer to GPU
     )
     
-    # Load Model
-    model = DeepfakeDetector(pretrained=True).to(device)
-    
     criterion = nn.BCELoss()
     # Optimizer (Sirf un parameters ko update karega jo freeze nahi hain)
     optimizer = optim.Adam(filter(lambda p: p.requires_grad, model.parameters()), lr=LEARNING_RATE)
@@ -144,7 +186,7 @@ def train():
             labels = labels.to(device).unsqueeze(1)
             
             # Forward
-            outputs = model(videos)
+            outputs = forward(videos)
             loss = criterion(outputs, labels)
             
             # Backward